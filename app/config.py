@@ -1,44 +1,84 @@
-import os
+from functools import lru_cache
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
-load_dotenv()
-
-# Required API keys
-SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
-JINA_API_KEY = os.getenv("JINA_API_KEY")
-
 class Settings(BaseSettings):
     # Required API Keys
     serpapi_api_key: Optional[str] = None
     jina_api_key: str
     
+    # Logging
+    log_level: str = "INFO"  # DEBUG logs full prompts and responses
+    
     # Search Provider Configuration
     search_provider: str = "ddg"  # Options: serpapi, ddg, bing
     bing_api_key: Optional[str] = None
+    search_max_concurrency: int = 4
+    search_requests_per_second: float = 0.0  # 0 disables request spacing
+    
+    # Jina Reader Configuration
+    jina_max_concurrency: int = 8
+    jina_requests_per_second: float = 0.0  # 0 disables request spacing
     
     # LLM Provider Configuration
     llm_provider: str = "openrouter"
     
+    # Research Configuration
+    max_concurrency: int = 10  # Links processed at once, across all research runs
+    context_budget_chars: int = 60_000  # Stop iterating once gathered contexts exceed this
+    
+    # Fetched Page Cache Configuration
+    page_cache_dir: Optional[str] = "research_outputs/.page_cache"  # Empty to disable
+    page_cache_ttl: int = 86400
+    
+    # LLM Response Cache Configuration
+    llm_cache_path: Optional[str] = "research_outputs/.llm_cache.sqlite3"  # Empty for memory only
+    llm_cache_redis_url: Optional[str] = None  # e.g. redis://localhost:6379/0; takes precedence over the path
+    llm_cache_size: int = 1024
+    llm_cache_ttl: int = 86400
+    llm_cache_max_temperature: float = 0.3  # Calls above this temperature are never cached
+    llm_cache_similarity_threshold: float = 0.92  # Reuse answers for near-duplicate long prompts; 0 disables
+    
     # OpenRouter Configuration
     openrouter_api_key: Optional[str] = None
     openrouter_model: str = "meta-llama/llama-3-8b-instruct:free"
+    openrouter_fast_model: Optional[str] = None  # Query generation and page evaluation; defaults to the main model
+    openrouter_max_concurrency: int = 4
+    openrouter_requests_per_second: float = 2.0
     
     # OpenAI Configuration
     openai_api_key: Optional[str] = None
     openai_model: str = "o1"  # Using O1 as default model
+    openai_fast_model: Optional[str] = None
+    openai_max_concurrency: int = 8
+    openai_requests_per_second: float = 8.0
     
     # Anthropic Configuration
     anthropic_api_key: Optional[str] = None
     anthropic_model: str = "claude-3-haiku-20240307"
+    anthropic_fast_model: Optional[str] = None
+    anthropic_max_concurrency: int = 4
+    anthropic_requests_per_second: float = 1.0
     
     # Ollama Configuration
     ollama_host: str = "http://localhost:11434"
     ollama_model: str = "llama2"
+    ollama_fast_model: Optional[str] = None
+    ollama_max_concurrency: int = 2
+    ollama_requests_per_second: float = 0.0  # 0 disables request spacing
     
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         case_sensitive=False
-    ) 
\ No newline at end of file
+    ) 
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load the .env file and build Settings once per process.
+    
+    Call ``get_settings.cache_clear()`` to force a reload from disk.
+    """
+    load_dotenv()
+    return Settings()
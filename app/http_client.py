@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import sys
+import aiohttp
+from typing import Optional
+from aiohttp.abc import AbstractResolver
+
+logger = logging.getLogger(__name__)
+
+def make_resolver() -> AbstractResolver:
+    """DNS resolver for outbound connectors.
+    
+    Uses aiodns so lookups stay on the event loop instead of blocking a thread on
+    getaddrinfo; falls back to the threaded resolver on Windows or without aiodns.
+    Must be called from a running event loop.
+    """
+    if sys.platform != "win32":
+        try:
+            return aiohttp.AsyncResolver()
+        except RuntimeError:  # aiodns is not installed
+            logger.warning("aiodns not available, falling back to threaded DNS resolution")
+    return aiohttp.ThreadedResolver()
+
+# Lazily created session shared by the whole process
+_session: Optional[aiohttp.ClientSession] = None
+_session_lock = asyncio.Lock()
+
+def create_session(
+    keepalive_timeout: float = 75,
+    timeout: Optional[aiohttp.ClientTimeout] = None
+) -> aiohttp.ClientSession:
+    """New HTTP session with a pooled connector sized for an iteration's fan-out
+    to search, Jina and the LLM provider. Must be called from a running event loop.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=32,
+            resolver=make_resolver(),
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=keepalive_timeout,
+            enable_cleanup_closed=True
+        ),
+        # Compressed bodies are decoded transparently
+        headers={"Accept-Encoding": "gzip, deflate"},
+        timeout=timeout or aiohttp.client.DEFAULT_TIMEOUT
+    )
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the process-wide HTTP session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        async with _session_lock:
+            if _session is None or _session.closed:
+                _session = create_session()
+    return _session
+
+async def close_session() -> None:
+    """Close the process-wide HTTP session, if one was created."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
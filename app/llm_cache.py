@@ -0,0 +1,273 @@
+from abc import ABC, abstractmethod
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import orjson
+from .similarity import shingles, jaccard
+
+logger = logging.getLogger(__name__)
+
+# Prompts shorter than this are only served by exact matches: in short prompts a
+# changed word or two still leaves a high similarity but changes the meaning
+SIMILARITY_MIN_CHARS = 2000
+# Signatures kept per scope for the similarity tier
+SIMILARITY_SCOPE_SIZE = 256
+
+# (scope, shingle signature of the last message) used by the similarity tier
+Signature = Tuple[str, FrozenSet[int]]
+
+class CacheBackend(ABC):
+    """Abstract base class for the persistent store behind LLMCache's in-memory LRU."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Return the value stored under key, or None if missing or expired."""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        """Store value under key for ttl seconds."""
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+class InMemoryLRU(CacheBackend):
+    """Bounded in-process store; entries expire after their TTL."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._entries[key] = (value, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class SQLiteBackend(CacheBackend):
+    """Completions in a local SQLite file; disk access runs in a worker thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self._db_get, key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await asyncio.to_thread(self._db_set, key, value, ttl)
+
+    async def aclose(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            # Purge rows that expired since the last run
+            self._db.execute("DELETE FROM completions WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        return self._db
+
+    def _db_get(self, key: str) -> Optional[str]:
+        try:
+            with self._db_lock:
+                db = self._connect()
+                row = db.execute(
+                    "SELECT value, expires_at FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= time.time():
+                    db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    db.commit()
+                    return None
+            return row[0]
+        except sqlite3.Error as e:
+            logger.error("Error reading LLM cache: %s", e)
+            return None
+
+    def _db_set(self, key: str, value: str, ttl: float) -> None:
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO completions (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, time.time() + ttl)
+                )
+                db.commit()
+        except sqlite3.Error as e:
+            logger.error("Error writing LLM cache: %s", e)
+
+class RedisBackend(CacheBackend):
+    """Completions in Redis, shared by every worker and host pointed at the same server.
+
+    Needs the optional ``redis`` package (5.0.1 or later).
+    """
+
+    def __init__(self, url: str, prefix: str = "llm:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RedisBackend needs the redis package: pip install redis") from e
+        self.prefix = prefix
+        self._client = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            return await self._client.get(self.prefix + key)
+        except Exception as e:
+            logger.error("Error reading LLM cache: %s", e)
+            return None
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        try:
+            await self._client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+        except Exception as e:
+            logger.error("Error writing LLM cache: %s", e)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+def make_backend(path: Optional[str] = None, redis_url: Optional[str] = None) -> Optional[CacheBackend]:
+    """Pick the persistent backend: Redis when a URL is given, else SQLite at path, else none."""
+    if redis_url:
+        try:
+            return RedisBackend(redis_url)
+        except RuntimeError as e:
+            logger.error("%s; falling back to %s", e, "SQLite" if path else "memory only")
+    if path:
+        return SQLiteBackend(path)
+    return None
+
+class LLMCache:
+    """Two-level cache of LLM completions: an in-memory LRU in front of a persistent backend.
+
+    The backend is a CacheBackend such as SQLiteBackend or RedisBackend;
+    pass ``backend=None`` for a memory-only cache.
+    
+    A similarity tier also serves long prompts whose final message is a near-duplicate
+    (word-trigram Jaccard at least ``similarity_threshold``) of one already answered
+    with the same model, temperature, preceding messages and caller-given scope. It is
+    opt-in per call, for prompts where near-identical page text means the same answer.
+    A threshold of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        maxsize: int = 1024,
+        ttl: float = 86400,
+        similarity_threshold: float = 0.92
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"hits": 0, "misses": 0, "similar_hits": 0}
+        self._memory = InMemoryLRU(maxsize)
+        self._signatures: "Dict[str, OrderedDict[str, FrozenSet[int]]]" = {}
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+        """Hash the request parameters that determine a completion."""
+        payload = orjson.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return hashlib.sha256(payload).hexdigest()
+
+    def signature(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        scope: str
+    ) -> Optional[Signature]:
+        """Similarity-tier signature for a request, or None if it is served by exact matches only.
+        
+        ``scope`` must hold every part of the final message that changes the answer
+        (such as the user and search queries); only requests with an identical scope
+        are compared, so near-duplicate text alone never crosses queries.
+        """
+        if not self.similarity_threshold or not messages:
+            return None
+        content = messages[-1].get("content", "")
+        if len(content) < SIMILARITY_MIN_CHARS:
+            return None
+        scope_key = self.make_key(model, [*messages[:-1], {"role": "scope", "content": scope}], temperature)
+        return scope_key, shingles(content)
+
+    async def get_similar(self, signature: Signature) -> Optional[str]:
+        """Return the completion of a near-duplicate request in the same scope, if any."""
+        scope, shingle_set = signature
+        for key, other in reversed(self._signatures.get(scope, {}).items()):
+            if jaccard(shingle_set, other) < self.similarity_threshold:
+                continue
+            value = await self._lookup(key)
+            if value is not None:
+                self.stats["similar_hits"] += 1
+                return value
+        return None
+
+    def add_similar(self, signature: Signature, key: str) -> None:
+        """Make the completion stored under key available to near-duplicate requests."""
+        scope, shingle_set = signature
+        entries = self._signatures.setdefault(scope, OrderedDict())
+        entries[key] = shingle_set
+        entries.move_to_end(key)
+        while len(entries) > SIMILARITY_SCOPE_SIZE:
+            entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, or None on a miss."""
+        value = await self._lookup(key)
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a completion in memory and, when configured, in the backend."""
+        ttl = ttl or self.ttl
+        await self._memory.set(key, value, ttl)
+        if self.backend is not None:
+            await self.backend.set(key, value, ttl)
+
+    async def aclose(self) -> None:
+        """Release the backend's connection."""
+        if self.backend is not None:
+            await self.backend.aclose()
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        value = await self._memory.get(key)
+        if value is None and self.backend is not None:
+            value = await self.backend.get(key)
+            if value is not None:
+                await self._memory.set(key, value, self.ttl)
+        return value
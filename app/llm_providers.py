@@ -1,45 +1,145 @@
 from abc import ABC, abstractmethod
+import functools
+import time
 import aiohttp
-import json
 import logging
-from typing import List, Dict, Optional
+import orjson
+from typing import Awaitable, Callable, ClassVar, List, Dict, Optional, Tuple
+from .rate_limiter import AsyncRateLimiter, backoff_delay, retrying_request
 
 logger = logging.getLogger(__name__)
 
+# Async callback receiving each text delta of a streamed completion
+DeltaCallback = Callable[[str], Awaitable[None]]
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
     
+    max_attempts: int = 3
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 30.0
+    retry_jitter: float = 0.5
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt, honoring a numeric Retry-After header."""
+        return backoff_delay(attempt, retry_after, self.retry_base_delay, self.retry_max_delay, self.retry_jitter)
+    
+    async def _post(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        payload: dict,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, bytes]:
+        """POST through the provider's rate limiter, retrying throttles and transient failures.
+        
+        Returns the final status code and raw response body.
+        """
+        body = orjson.dumps(payload)  # Serialized once and reused across retries
+        return await retrying_request(
+            lambda: session.post(url, headers=headers, data=body),
+            limiter=self._limiter,
+            name=type(self).__name__,
+            max_attempts=self.max_attempts,
+            delay=self._retry_delay
+        )
+    
+    def _parse_stream_delta(self, event: dict) -> Optional[str]:
+        """Extract the text delta from one streamed event; overridden per provider."""
+        return None
+    
+    async def _stream(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        payload: dict,
+        headers: Optional[Dict[str, str]] = None,
+        on_delta: Optional[DeltaCallback] = None
+    ) -> Optional[str]:
+        """POST a streaming request and return the accumulated completion text.
+        
+        Accepts both SSE (``data: {...}``) and newline-delimited JSON bodies, passing
+        each text delta to ``on_delta`` as it arrives. Streams are not retried, since
+        replaying one would repeat deltas the caller has already seen.
+        """
+        name = type(self).__name__
+        parts: List[str] = []
+        async with self._limiter:
+            async with session.post(url, headers=headers, data=orjson.dumps(payload)) as resp:
+                if resp.status != 200:
+                    raw = await resp.read()
+                    logger.error("%s API error: %s", name, resp.status)
+                    logger.error("Response: %s", raw.decode('utf-8', 'replace'))
+                    return None
+                
+                async for line in resp.content:
+                    line = line.strip()
+                    # Skip blank separators, SSE event names and SSE comments
+                    if not line or line.startswith((b"event:", b":")):
+                        continue
+                    if line.startswith(b"data:"):
+                        line = line[5:].strip()
+                    if line == b"[DONE]":
+                        break
+                    delta = self._parse_stream_delta(orjson.loads(line))
+                    if delta:
+                        parts.append(delta)
+                        if on_delta is not None:
+                            await on_delta(delta)
+        return "".join(parts)
+    
     @abstractmethod
     async def generate_completion(
         self,
         session: aiohttp.ClientSession,
         messages: List[Dict[str, str]],
         max_tokens: int = 1000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        stream: bool = False,
+        on_delta: Optional[DeltaCallback] = None
     ) -> Optional[str]:
-        """Generate a completion from the LLM."""
+        """Generate a completion from the LLM.
+        
+        With ``stream=True`` the response is streamed and each text delta is passed
+        to ``on_delta``; the full completion is still returned.
+        """
         pass
 
 class OpenRouterProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "meta-llama/llama-3-8b-instruct:free"):
+    URL: ClassVar[str] = "https://openrouter.ai/api/v1/chat/completions"
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "meta-llama/llama-3-8b-instruct:free",
+        max_concurrency: int = 4,
+        requests_per_second: float = 2.0
+    ):
+        if not api_key:
+            raise ValueError("OpenRouter API key not configured")
         self.api_key = api_key
         self.model = model
-        self.url = "https://openrouter.ai/api/v1/chat/completions"
+        self._headers = {
+            "Authorization": f"Bearer {api_key}",
+            "HTTP-Referer": "https://github.com/yourusername/OpenDeepResearcher-API",
+            "X-Title": "OpenDeepResearcher API",
+            "Content-Type": "application/json"
+        }
+        self._limiter = AsyncRateLimiter(max_concurrency, requests_per_second)
+    
+    def _parse_stream_delta(self, event: dict) -> Optional[str]:
+        choices = event.get("choices")
+        return choices[0].get("delta", {}).get("content") if choices else None
     
     async def generate_completion(
         self,
         session: aiohttp.ClientSession,
         messages: List[Dict[str, str]],
         max_tokens: int = 1000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        stream: bool = False,
+        on_delta: Optional[DeltaCallback] = None
     ) -> Optional[str]:
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "HTTP-Referer": "https://github.com/yourusername/OpenDeepResearcher-API",
-            "X-Title": "OpenDeepResearcher API",
-            "Content-Type": "application/json"
-        }
-        
         try:
             payload = {
                 "model": self.model,
@@ -48,66 +148,88 @@ class OpenRouterProvider(LLMProvider):
                 "max_tokens": max_tokens
             }
             
-            async with session.post(self.url, headers=headers, json=payload) as resp:
-                response_text = await resp.text()
-                logger.debug(f"OpenRouter raw response: {response_text}")
-                
-                if resp.status == 200:
-                    data = json.loads(response_text)
-                    return data["choices"][0]["message"]["content"]
-                elif resp.status == 429:
-                    data = json.loads(response_text)
-                    error_msg = data.get("error", {}).get("message", "Rate limit exceeded")
-                    logger.error(f"OpenRouter rate limit error: {error_msg}")
-                    return None
-                else:
-                    logger.error(f"OpenRouter API error: {resp.status}")
-                    logger.error(f"Response: {response_text}")
-                    return None
+            if stream:
+                payload["stream"] = True
+                return await self._stream(session, self.URL, payload, self._headers, on_delta)
+            
+            status, raw = await self._post(session, self.URL, payload, self._headers)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("OpenRouter raw response: %s", raw.decode('utf-8', 'replace'))
+            
+            if status == 200:
+                data = orjson.loads(raw)
+                return data["choices"][0]["message"]["content"]
+            elif status == 429:
+                data = orjson.loads(raw)
+                error_msg = data.get("error", {}).get("message", "Rate limit exceeded")
+                logger.error("OpenRouter rate limit error: %s", error_msg)
+                return None
+            else:
+                logger.error("OpenRouter API error: %s", status)
+                logger.error("Response: %s", raw.decode('utf-8', 'replace'))
+                return None
         except Exception as e:
-            logger.error(f"Error calling OpenRouter: {str(e)}", exc_info=True)
+            logger.error("Error calling OpenRouter: %s", e, exc_info=True)
             return None
 
 class OpenAIProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
+    BASE_URL: ClassVar[str] = "https://api.openai.com/v1"
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-3.5-turbo",
+        max_concurrency: int = 8,
+        requests_per_second: float = 8.0
+    ):
+        if not api_key:
+            raise ValueError("OpenAI API key not configured")
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://api.openai.com/v1"
-    
-    async def list_available_models(self, session: aiohttp.ClientSession) -> List[str]:
-        """Fetch available models from OpenAI API."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
+        self._models_cache: Optional[Tuple[float, List[str]]] = None
+        self._headers = {
+            "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self._limiter = AsyncRateLimiter(max_concurrency, requests_per_second)
+    
+    # Seconds a fetched model list stays valid
+    models_cache_ttl: float = 300.0
+    
+    async def list_available_models(self, session: aiohttp.ClientSession) -> List[str]:
+        """Fetch available models from OpenAI API, cached for models_cache_ttl seconds."""
+        if self._models_cache and time.monotonic() - self._models_cache[0] < self.models_cache_ttl:
+            return self._models_cache[1]
         
         try:
-            async with session.get(f"{self.base_url}/models", headers=headers) as resp:
+            async with session.get(f"{self.BASE_URL}/models", headers=self._headers) as resp:
                 if resp.status == 200:
-                    data = await resp.json()
+                    data = await resp.json(loads=orjson.loads)
                     # Filter for chat models only
-                    models = [model["id"] for model in data["data"] 
-                            if "gpt" in model["id"] or model["id"].startswith("ft:")]
-                    return sorted(models)
+                    models = sorted(model["id"] for model in data["data"] 
+                            if "gpt" in model["id"] or model["id"].startswith("ft:"))
+                    self._models_cache = (time.monotonic(), models)
+                    return models
                 else:
-                    logger.error(f"OpenAI models fetch error: {resp.status}")
+                    logger.error("OpenAI models fetch error: %s", resp.status)
                     return []
         except Exception as e:
-            logger.error(f"Error fetching OpenAI models: {str(e)}", exc_info=True)
+            logger.error("Error fetching OpenAI models: %s", e, exc_info=True)
             return []
     
+    def _parse_stream_delta(self, event: dict) -> Optional[str]:
+        choices = event.get("choices")
+        return choices[0].get("delta", {}).get("content") if choices else None
+    
     async def generate_completion(
         self,
         session: aiohttp.ClientSession,
         messages: List[Dict[str, str]],
         max_tokens: int = 1000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        stream: bool = False,
+        on_delta: Optional[DeltaCallback] = None
     ) -> Optional[str]:
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         try:
             payload = {
                 "model": self.model,
@@ -116,50 +238,74 @@ class OpenAIProvider(LLMProvider):
                 "max_tokens": max_tokens
             }
             
-            async with session.post(f"{self.base_url}/chat/completions", headers=headers, json=payload) as resp:
-                response_text = await resp.text()
-                logger.debug(f"OpenAI raw response: {response_text}")
-                
-                if resp.status == 200:
-                    data = json.loads(response_text)
-                    return data["choices"][0]["message"]["content"]
-                elif resp.status == 429:
-                    logger.error("OpenAI rate limit exceeded")
-                    return None
-                else:
-                    logger.error(f"OpenAI API error: {resp.status}")
-                    logger.error(f"Response: {response_text}")
-                    return None
+            if stream:
+                payload["stream"] = True
+                return await self._stream(session, f"{self.BASE_URL}/chat/completions", payload, self._headers, on_delta)
+            
+            status, raw = await self._post(session, f"{self.BASE_URL}/chat/completions", payload, self._headers)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("OpenAI raw response: %s", raw.decode('utf-8', 'replace'))
+            
+            if status == 200:
+                data = orjson.loads(raw)
+                return data["choices"][0]["message"]["content"]
+            elif status == 429:
+                logger.error("OpenAI rate limit exceeded")
+                return None
+            else:
+                logger.error("OpenAI API error: %s", status)
+                logger.error("Response: %s", raw.decode('utf-8', 'replace'))
+                return None
         except Exception as e:
-            logger.error(f"Error calling OpenAI: {str(e)}", exc_info=True)
+            logger.error("Error calling OpenAI: %s", e, exc_info=True)
             return None
 
 class AnthropicProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "claude-3-haiku-20240307"):
+    URL: ClassVar[str] = "https://api.anthropic.com/v1/messages"
+    
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-haiku-20240307",
+        max_concurrency: int = 4,
+        requests_per_second: float = 1.0
+    ):
+        if not api_key:
+            raise ValueError("Anthropic API key not configured")
         self.api_key = api_key
         self.model = model
-        self.url = "https://api.anthropic.com/v1/messages"
+        self._headers = {
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+        self._limiter = AsyncRateLimiter(max_concurrency, requests_per_second)
+    
+    def _parse_stream_delta(self, event: dict) -> Optional[str]:
+        if event.get("type") == "content_block_delta":
+            return event["delta"].get("text")
+        return None
     
     async def generate_completion(
         self,
         session: aiohttp.ClientSession,
         messages: List[Dict[str, str]],
         max_tokens: int = 1000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        stream: bool = False,
+        on_delta: Optional[DeltaCallback] = None
     ) -> Optional[str]:
-        headers = {
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json",
-        }
-        
         try:
-            # Convert chat format to Anthropic format
-            system_message = next((m["content"] for m in messages if m["role"] == "system"), "")
-            user_message = next((m["content"] for m in messages if m["role"] == "user"), "")
-            
-            if system_message:
-                user_message = f"{system_message}\n\n{user_message}"
+            # Convert chat format to Anthropic format: system text goes in the top-level field
+            system_message = user_message = ""
+            for m in messages:
+                role = m["role"]
+                if role == "system" and not system_message:
+                    system_message = m["content"]
+                elif role == "user" and not user_message:
+                    user_message = m["content"]
+                if system_message and user_message:
+                    break
             
             payload = {
                 "model": self.model,
@@ -167,74 +313,148 @@ class AnthropicProvider(LLMProvider):
                 "max_tokens": max_tokens,
                 "temperature": temperature
             }
+            if system_message:
+                payload["system"] = system_message
             
-            async with session.post(self.url, headers=headers, json=payload) as resp:
-                response_text = await resp.text()
-                logger.debug(f"Anthropic raw response: {response_text}")
-                
-                if resp.status == 200:
-                    data = json.loads(response_text)
-                    return data["content"][0]["text"]
-                elif resp.status == 429:
-                    logger.error("Anthropic rate limit exceeded")
-                    return None
-                else:
-                    logger.error(f"Anthropic API error: {resp.status}")
-                    logger.error(f"Response: {response_text}")
-                    return None
+            if stream:
+                payload["stream"] = True
+                return await self._stream(session, self.URL, payload, self._headers, on_delta)
+            
+            status, raw = await self._post(session, self.URL, payload, self._headers)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Anthropic raw response: %s", raw.decode('utf-8', 'replace'))
+            
+            if status == 200:
+                data = orjson.loads(raw)
+                return data["content"][0]["text"]
+            elif status == 429:
+                logger.error("Anthropic rate limit exceeded")
+                return None
+            else:
+                logger.error("Anthropic API error: %s", status)
+                logger.error("Response: %s", raw.decode('utf-8', 'replace'))
+                return None
         except Exception as e:
-            logger.error(f"Error calling Anthropic: {str(e)}", exc_info=True)
+            logger.error("Error calling Anthropic: %s", e, exc_info=True)
             return None
 
 class OllamaProvider(LLMProvider):
-    def __init__(self, host: str = "http://localhost:11434", model: str = "llama2"):
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        model: str = "llama2",
+        max_concurrency: int = 2,
+        requests_per_second: float = 0.0
+    ):
         self.host = host.rstrip('/')
         self.model = model
         self.url = f"{self.host}/api/chat"
+        self._headers = {"Content-Type": "application/json"}
+        self._limiter = AsyncRateLimiter(max_concurrency, requests_per_second)
+    
+    def _parse_stream_delta(self, event: dict) -> Optional[str]:
+        return event.get("message", {}).get("content")
     
     async def generate_completion(
         self,
         session: aiohttp.ClientSession,
         messages: List[Dict[str, str]],
         max_tokens: int = 1000,
-        temperature: float = 0.3
+        temperature: float = 0.3,
+        stream: bool = False,
+        on_delta: Optional[DeltaCallback] = None
     ) -> Optional[str]:
         try:
             payload = {
                 "model": self.model,
                 "messages": messages,
-                "stream": False,
+                "stream": stream,
                 "options": {
                     "temperature": temperature,
                 }
             }
             
-            async with session.post(self.url, json=payload) as resp:
-                response_text = await resp.text()
-                logger.debug(f"Ollama raw response: {response_text}")
-                
-                if resp.status == 200:
-                    data = json.loads(response_text)
-                    return data["message"]["content"]
-                else:
-                    logger.error(f"Ollama API error: {resp.status}")
-                    logger.error(f"Response: {response_text}")
-                    return None
+            if stream:
+                return await self._stream(session, self.url, payload, self._headers, on_delta)
+            
+            status, raw = await self._post(session, self.url, payload, self._headers)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Ollama raw response: %s", raw.decode('utf-8', 'replace'))
+            
+            if status == 200:
+                data = orjson.loads(raw)
+                return data["message"]["content"]
+            else:
+                logger.error("Ollama API error: %s", status)
+                logger.error("Response: %s", raw.decode('utf-8', 'replace'))
+                return None
         except Exception as e:
-            logger.error(f"Error calling Ollama: {str(e)}", exc_info=True)
+            logger.error("Error calling Ollama: %s", e, exc_info=True)
             return None
 
-def get_llm_provider(config) -> LLMProvider:
-    """Factory function to create the appropriate LLM provider based on configuration."""
-    provider = config.llm_provider.lower()
-    
+@functools.lru_cache(maxsize=8)
+def _provider_limiter(
+    provider: str,
+    credential: Optional[str],
+    max_concurrency: int,
+    requests_per_second: float
+) -> AsyncRateLimiter:
+    return AsyncRateLimiter(max_concurrency, requests_per_second)
+
+@functools.lru_cache(maxsize=8)
+def _build_provider(
+    provider: str,
+    model: str,
+    credential: Optional[str],
+    max_concurrency: int,
+    requests_per_second: float
+) -> LLMProvider:
+    """Build a provider instance; cached so identical configurations reuse one object.
+
+    ``credential`` is the API key, or the host for Ollama.
+    """
     if provider == "openrouter":
-        return OpenRouterProvider(config.openrouter_api_key, config.openrouter_model)
+        instance = OpenRouterProvider(credential, model, max_concurrency, requests_per_second)
     elif provider == "openai":
-        return OpenAIProvider(config.openai_api_key, config.openai_model)
+        instance = OpenAIProvider(credential, model, max_concurrency, requests_per_second)
     elif provider == "anthropic":
-        return AnthropicProvider(config.anthropic_api_key, config.anthropic_model)
+        instance = AnthropicProvider(credential, model, max_concurrency, requests_per_second)
     elif provider == "ollama":
-        return OllamaProvider(config.ollama_host, config.ollama_model)
+        instance = OllamaProvider(credential, model, max_concurrency, requests_per_second)
     else:
-        raise ValueError(f"Unsupported LLM provider: {provider}") 
\ No newline at end of file
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+    
+    # Models of one provider and credential share its rate limits
+    instance._limiter = _provider_limiter(provider, credential, max_concurrency, requests_per_second)
+    return instance
+
+# Every provider name get_llm_provider understands
+LLM_PROVIDER_NAMES = ("openrouter", "openai", "anthropic", "ollama")
+
+def get_llm_provider(config, provider: Optional[str] = None, fast: bool = False) -> LLMProvider:
+    """Factory function to create the appropriate LLM provider based on configuration.
+    
+    ``provider`` overrides ``config.llm_provider`` to build a specific provider. With
+    ``fast`` the provider uses ``<provider>_fast_model`` when one is configured, for
+    high-volume calls such as query generation and page evaluation.
+    """
+    provider = (provider or config.llm_provider).lower()
+    
+    if provider in ("openrouter", "openai", "anthropic"):
+        credential = getattr(config, f"{provider}_api_key")
+    elif provider == "ollama":
+        credential = config.ollama_host
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+    
+    model = getattr(config, f"{provider}_model")
+    if fast:
+        model = getattr(config, f"{provider}_fast_model", None) or model
+    
+    return _build_provider(
+        provider,
+        model,
+        credential,
+        getattr(config, f"{provider}_max_concurrency"),
+        getattr(config, f"{provider}_requests_per_second")
+    )
@@ -0,0 +1,32 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+from typing import Optional, Union
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(level: Union[int, str] = logging.INFO) -> None:
+    """Log to stderr through a background thread so the event loop never blocks on writes.
+    
+    Records are put on an unbounded queue by a QueueHandler on the root logger; a
+    QueueListener thread formats them and writes them out. Calling this again only
+    updates the level.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush queued records on interpreter exit
+    atexit.register(_listener.stop)
@@ -1,26 +1,22 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Dict
 import asyncio
-import nest_asyncio
 import logging
-import json
+import orjson
 from .researcher import ResearchEngine
-from .config import Settings
-import aiohttp
-from .llm_providers import OpenAIProvider
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+from .config import get_settings
+from .logging_config import configure_logging
+from .http_client import get_session, close_session
+from .llm_providers import LLMProvider, LLM_PROVIDER_NAMES, OpenAIProvider, get_llm_provider
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+# Load settings and configure logging
+settings = get_settings()
+configure_logging(settings.log_level.upper())
+logger = logging.getLogger(__name__)
+logger.info("Loaded application settings")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -38,26 +34,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load settings
-settings = Settings()
-logger.info("Loaded application settings")
+# Provider availability depends only on settings, so build it once
+_AVAILABLE_PROVIDERS = [
+    {"id": "openai", "name": "OpenAI", "available": bool(settings.openai_api_key)},
+    {"id": "anthropic", "name": "Anthropic", "available": bool(settings.anthropic_api_key)},
+    {"id": "openrouter", "name": "OpenRouter", "available": bool(settings.openrouter_api_key)},
+    {"id": "ollama", "name": "Ollama", "available": True}  # Always available locally
+]
 
-# Initialize research engine
-research_engine = ResearchEngine(
-    jina_api_key=settings.jina_api_key,
-    config=settings
-)
-logger.info("Initialized ResearchEngine")
+# Default models; OpenAI's list is fetched from the API per request
+_BASE_AVAILABLE_MODELS = {
+    "anthropic": ["claude-3-haiku-20240307", "claude-3-sonnet-20240229"],
+    "openrouter": ["meta-llama/llama-3-8b-instruct:free", "anthropic/claude-3-haiku", "google/gemini-pro"],
+    "ollama": ["llama2", "mistral", "gemma"]
+}
+
+# Research engine is created on startup, once the shared HTTP session exists
+research_engine: Optional[ResearchEngine] = None
+
+# Provider instances for every configured provider, built on startup
+llm_providers: Dict[str, LLMProvider] = {}
+
+# Providers that need an API key, with their display names
+_KEYED_PROVIDERS = {"openai": "OpenAI", "anthropic": "Anthropic", "openrouter": "OpenRouter"}
+
+def _assert_key(provider: str) -> None:
+    """Raise ValueError if the provider needs an API key and none is configured."""
+    if provider in _KEYED_PROVIDERS and not getattr(settings, f"{provider}_api_key"):
+        raise ValueError(f"{_KEYED_PROVIDERS[provider]} API key not configured")
+
+def _provider_configured(provider: str) -> bool:
+    """Ollama runs locally; every other provider needs an API key."""
+    return provider == "ollama" or bool(getattr(settings, f"{provider}_api_key", None))
+
+@app.on_event("startup")
+async def startup():
+    """Create the shared HTTP session and the research engine that uses it."""
+    global research_engine
+    # Fail fast on a missing key instead of on the first LLM call
+    _assert_key(settings.llm_provider.lower())
+    llm_providers.update(
+        (name, get_llm_provider(settings, name))
+        for name in LLM_PROVIDER_NAMES
+        if _provider_configured(name)
+    )
+    app.state.http_session = await get_session()
+    research_engine = ResearchEngine(
+        jina_api_key=settings.jina_api_key,
+        config=settings,
+        session=app.state.http_session
+    )
+    logger.info("Initialized ResearchEngine")
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the research engine and the shared HTTP session."""
+    if research_engine is not None:
+        await research_engine.aclose()
+    await close_session()
 
 class ResearchRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     query: str
-    max_iterations: Optional[int] = 10
+    max_iterations: Optional[int] = 10  # Upper bound; research stops earlier once the LLM has enough
+    stream_report: bool = False  # Stream the final report as report_delta events
 
 class ResearchResponse(BaseModel):
     report: str
     logs: List[str]
 
 class LLMConfig(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     provider: str
     model: Optional[str] = None
 
@@ -67,45 +116,68 @@ class LLMConfigResponse(BaseModel):
     available_providers: List[dict]
     available_models: dict
 
+# Status queue bound and the most updates coalesced into one SSE write
+STATUS_QUEUE_SIZE = 64
+STATUS_BATCH_SIZE = 16
+
 async def research_status_generator(request: ResearchRequest):
     """Generate SSE events for research status updates."""
+    research_task = None
     try:
-        # Create a queue for status updates
-        status_queue = asyncio.Queue()
+        # Bounded queue so a chatty research run applies backpressure
+        status_queue = asyncio.Queue(maxsize=STATUS_QUEUE_SIZE)
         
         # Start research process in background
         research_task = asyncio.create_task(
             research_engine.research(
                 request.query,
                 request.max_iterations,
-                status_queue=status_queue
+                status_queue=status_queue,
+                stream_report=request.stream_report
             )
         )
         
         # Stream status updates
         while True:
             try:
-                # Get status update from queue
-                status = await status_queue.get()
+                # Wait for the next update, then drain whatever else is already queued
+                batch = [await status_queue.get()]
+                while len(batch) < STATUS_BATCH_SIZE:
+                    try:
+                        batch.append(status_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
                 
-                # Check if research is complete
-                if status.get("type") == "complete":
-                    report = status.get("report", "")
-                    logs = status.get("logs", [])
-                    yield f"data: {json.dumps({'type': 'complete', 'report': report, 'logs': logs})}\n\n"
-                    break
+                frames = []
+                complete = False
+                for status in batch:
+                    # Check if research is complete
+                    if status.get("type") == "complete":
+                        report = status.get("report", "")
+                        logs = status.get("logs", [])
+                        frames.append(f"data: {orjson.dumps({'type': 'complete', 'report': report, 'logs': logs}).decode()}\n\n")
+                        complete = True
+                        break
+                    frames.append(f"data: {orjson.dumps(status).decode()}\n\n")
                 
-                # Send status update
-                yield f"data: {json.dumps(status)}\n\n"
+                # Send the batched status updates in one write
+                yield "".join(frames)
+                if complete:
+                    break
                 
             except asyncio.CancelledError:
                 research_task.cancel()
-                yield f"data: {json.dumps({'type': 'error', 'message': 'Research cancelled'})}\n\n"
+                yield f"data: {orjson.dumps({'type': 'error', 'message': 'Research cancelled'}).decode()}\n\n"
                 break
             
     except Exception as e:
-        logger.error(f"Error during research: {str(e)}", exc_info=True)
-        yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        logger.error("Error during research: %s", e, exc_info=True)
+        yield f"data: {orjson.dumps({'type': 'error', 'message': str(e)}).decode()}\n\n"
+    finally:
+        # A client that disconnects mid-stream closes the generator at a yield; without this the
+        # research task would block forever on the full queue nobody reads
+        if research_task is not None and not research_task.done():
+            research_task.cancel()
 
 @app.post("/api/research/stream")
 async def stream_research(request: ResearchRequest):
@@ -118,17 +190,17 @@ async def stream_research(request: ResearchRequest):
 @app.post("/api/research", response_model=ResearchResponse)
 async def perform_research(request: ResearchRequest):
     """Traditional synchronous research endpoint."""
-    logger.info(f"Received research request: {request.query} (max_iterations: {request.max_iterations})")
+    logger.info("Received research request: %s (max_iterations: %s)", request.query, request.max_iterations)
     try:
         report, logs = await research_engine.research(
             request.query,
             request.max_iterations
         )
         logger.info("Research completed successfully")
-        logger.debug(f"Research logs: {logs}")
+        logger.debug("Research logs: %s", logs)
         return ResearchResponse(report=report, logs=logs)
     except Exception as e:
-        logger.error(f"Error during research: {str(e)}", exc_info=True)
+        logger.error("Error during research: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/health")
@@ -139,35 +211,22 @@ async def health_check():
 @app.get("/api/config/llm", response_model=LLMConfigResponse)
 async def get_llm_config():
     """Get current LLM configuration and available options."""
-    available_providers = [
-        {"id": "openai", "name": "OpenAI", "available": bool(settings.openai_api_key)},
-        {"id": "anthropic", "name": "Anthropic", "available": bool(settings.anthropic_api_key)},
-        {"id": "openrouter", "name": "OpenRouter", "available": bool(settings.openrouter_api_key)},
-        {"id": "ollama", "name": "Ollama", "available": True}  # Always available locally
-    ]
-    
-    # Initialize default models
-    available_models = {
-        "anthropic": ["claude-3-haiku-20240307", "claude-3-sonnet-20240229"],
-        "openrouter": ["meta-llama/llama-3-8b-instruct:free", "anthropic/claude-3-haiku", "google/gemini-pro"],
-        "ollama": ["llama2", "mistral", "gemma"]
-    }
+    available_models = dict(_BASE_AVAILABLE_MODELS)
     
     # Fetch OpenAI models if API key is available
     if settings.openai_api_key:
-        async with aiohttp.ClientSession() as session:
-            openai_provider = research_engine.llm_provider
-            if isinstance(openai_provider, OpenAIProvider):
-                available_models["openai"] = await openai_provider.list_available_models(session)
-            else:
-                available_models["openai"] = []  # Empty list if not using OpenAI
+        openai_provider = research_engine.llm_provider
+        if isinstance(openai_provider, OpenAIProvider):
+            available_models["openai"] = await openai_provider.list_available_models(app.state.http_session)
+        else:
+            available_models["openai"] = []  # Empty list if not using OpenAI
     else:
         available_models["openai"] = []
     
     return LLMConfigResponse(
         current_provider=settings.llm_provider,
         current_model=getattr(settings, f"{settings.llm_provider}_model", None),
-        available_providers=available_providers,
+        available_providers=_AVAILABLE_PROVIDERS,
         available_models=available_models
     )
 
@@ -175,23 +234,23 @@ async def get_llm_config():
 async def update_llm_config(config: LLMConfig):
     """Update LLM configuration."""
     # Validate provider is available
-    if config.provider == "openai" and not settings.openai_api_key:
-        raise HTTPException(status_code=400, detail="OpenAI API key not configured")
-    elif config.provider == "anthropic" and not settings.anthropic_api_key:
-        raise HTTPException(status_code=400, detail="Anthropic API key not configured")
-    elif config.provider == "openrouter" and not settings.openrouter_api_key:
-        raise HTTPException(status_code=400, detail="OpenRouter API key not configured")
+    try:
+        _assert_key(config.provider)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if config.provider not in llm_providers:
+        raise HTTPException(status_code=400, detail=f"Unsupported LLM provider: {config.provider}")
     
     # Update the configuration
     settings.llm_provider = config.provider
     if config.model:
         setattr(settings, f"{config.provider}_model", config.model)
+        llm_providers[config.provider] = get_llm_provider(settings)
     
-    # Reinitialize the research engine with new settings
-    global research_engine
-    research_engine = ResearchEngine(
-        jina_api_key=settings.jina_api_key,
-        config=settings
+    # Swap the prebuilt providers onto the live engine
+    research_engine.set_provider(
+        llm_providers[config.provider],
+        get_llm_provider(settings, config.provider, fast=True)
     )
     
     return {"status": "success", "message": "LLM configuration updated"} 
\ No newline at end of file
@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class PageCache:
+    """On-disk cache of fetched page text, one file per URL named by its SHA-1.
+    
+    Entries older than ``ttl`` seconds (by file modification time) are deleted when read.
+    File access runs in a worker thread so the event loop never blocks on it.
+    """
+
+    def __init__(self, directory: str, ttl: float = 86400):
+        self.directory = directory
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._ready = False
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha1(url.encode()).hexdigest()}.txt")
+
+    async def get(self, url: str) -> Optional[str]:
+        """Return the cached text for url, or None if missing or expired."""
+        content = await asyncio.to_thread(self._read, self._path(url))
+        self.stats["hits" if content is not None else "misses"] += 1
+        return content
+
+    async def set(self, url: str, content: str) -> None:
+        """Store the text fetched for url."""
+        await asyncio.to_thread(self._write, self._path(url), content)
+
+    def _read(self, path: str) -> Optional[str]:
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                # Expired entries are deleted so the directory doesn't grow without bound
+                os.remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error("Error reading page cache: %s", e)
+            return None
+
+    def _write(self, path: str, content: str) -> None:
+        try:
+            if not self._ready:
+                os.makedirs(self.directory, exist_ok=True)
+                self._ready = True
+            # Write then rename so concurrent readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("Error writing page cache: %s", e)
@@ -0,0 +1,92 @@
+import asyncio
+import contextlib
+import logging
+import random
+import time
+import aiohttp
+from typing import Any, Awaitable, Callable, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rate limiting and transient server errors are worth another attempt
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def backoff_delay(
+    attempt: int,
+    retry_after: Optional[str] = None,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+    jitter: float = 0.5
+) -> float:
+    """Seconds to wait before retry number ``attempt + 1``, honoring a numeric Retry-After header."""
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass  # HTTP-date form; fall back to exponential backoff
+    return min(base_delay * 2 ** attempt + random.uniform(0, jitter), max_delay)
+
+class AsyncRateLimiter:
+    """Async context manager bounding concurrency and request rate.
+
+    A semaphore caps the number of requests in flight, and a lock-guarded
+    timestamp spaces request starts at least ``1 / requests_per_second``
+    apart. A rate of 0 disables the spacing and only bounds concurrency.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_second: float = 0.0):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+        self._min_interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._last_ts = 0.0
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        await self._semaphore.acquire()
+        if self._min_interval:
+            try:
+                async with self._lock:
+                    delay = self._last_ts + self._min_interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    self._last_ts = time.monotonic()
+            except BaseException:
+                self._semaphore.release()
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._semaphore.release()
+
+async def retrying_request(
+    send: Callable[[], Any],
+    read: Optional[Callable[[aiohttp.ClientResponse], Awaitable[T]]] = None,
+    limiter: Optional[AsyncRateLimiter] = None,
+    name: str = "Request",
+    max_attempts: int = 3,
+    delay: Callable[..., float] = backoff_delay
+) -> Tuple[int, T]:
+    """Send a request through ``limiter``, retrying throttles, connection errors and timeouts.
+    
+    ``send`` opens a fresh request per attempt (e.g. ``lambda: session.get(url)``) and
+    ``read`` consumes the final response, the raw body by default. Returns the final
+    status code and what ``read`` returned; the last connection error is re-raised.
+    """
+    for attempt in range(max_attempts):
+        last_attempt = attempt == max_attempts - 1
+        try:
+            async with limiter or contextlib.nullcontext():
+                async with send() as resp:
+                    if resp.status not in RETRYABLE_STATUSES or last_attempt:
+                        return resp.status, await (read(resp) if read is not None else resp.read())
+                    wait = delay(attempt, resp.headers.get("Retry-After"))
+                    logger.warning("%s returned %s, retrying in %.1fs", name, resp.status, wait)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            # ClientConnectionError covers refused connections, resets and dropped keep-alives
+            if last_attempt:
+                raise
+            wait = delay(attempt)
+            logger.warning("%s failed (%s), retrying in %.1fs", name, type(e).__name__, wait)
+        # Back off outside the limiter so other requests can proceed meanwhile
+        await asyncio.sleep(wait)
@@ -1,143 +1,614 @@
+import ast
 import asyncio
+import functools
 import aiohttp
-from typing import List, Tuple, Dict, Optional
-import json
+from collections import OrderedDict
+from typing import Awaitable, Callable, FrozenSet, List, Literal, Set, Tuple, Dict, Optional, TypeVar
+import hashlib
 import logging
 import os
-from .llm_providers import get_llm_provider, LLMProvider
+import re
+import time
+import warnings
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import orjson
+from lxml import etree, html as lxml_html
+from .llm_providers import get_llm_provider, LLMProvider, DeltaCallback
 from .search_providers import get_search_provider
+from .http_client import create_session
+from .rate_limiter import AsyncRateLimiter, retrying_request
+from .llm_cache import LLMCache, Signature, make_backend
+from .page_cache import PageCache
+from .similarity import shingles, jaccard, dedupe, query_overlap, DedupeBuffer
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
+# Library module: the application decides where records go (see logging_config)
+logger.addHandler(logging.NullHandler())
+
+T = TypeVar("T")
+
+# Kinds of LLM call; the high-volume ones go to the provider's fast model. Page evaluation
+# (relevance classification with its extraction fused in) is "classifier"
+LLMRole = Literal["query", "classifier", "report"]
+_FAST_ROLES = frozenset({"query", "classifier"})
+
+# Pages at least this similar share a usefulness verdict
+NEAR_DUPLICATE_THRESHOLD = 0.92
+# Number of user queries whose usefulness verdicts are remembered
+USEFUL_CACHE_QUERIES = 32
+# Contexts at least this similar are sent to the LLM only once
+CONTEXT_DUPLICATE_THRESHOLD = 0.85
+# Search queries whose result links are remembered
+SERP_CACHE_SIZE = 256
+# Fetched pages kept in memory, in front of the on-disk page cache
+FETCH_CACHE_SIZE = 512
+# Attempts per Jina fetch when it is throttled or fails to connect
+JINA_MAX_ATTEMPTS = 3
+# Seconds one link's fetch may take before the iteration moves on without it
+LINK_TIMEOUT = 30
+# Connect and between-reads timeouts for Jina, so a stalled page fails fast
+JINA_TIMEOUT = aiohttp.ClientTimeout(sock_connect=5, sock_read=20)
+# Bytes of page content read from Jina: enough to fill PAGE_TOKEN_BUDGET after boilerplate
+# is stripped, even for multi-byte scripts, without downloading multi-megabyte pages
+MAX_PAGE_BYTES = 64 * 1024
+# Pages shorter than this are treated as error or paywall boilerplate
+MIN_PAGE_CHARS = 500
+# Minimum fraction of the user query's topic words a page must contain to reach the LLM
+MIN_QUERY_OVERLAP = 0.15
+# Approximate token budget for one page in a single-page prompt
+PAGE_TOKEN_BUDGET = 4000
+# Rough characters per token, for budgeting without a provider tokenizer
+CHARS_PER_TOKEN = 4
+# Lines shorter than this without sentence punctuation are treated as navigation
+NAV_LINE_CHARS = 30
+# Pages judged and extracted per batched evaluation call, with per-page input and output budgets
+EVAL_BATCH_SIZE = 4
+EVAL_ITEM_INPUT_TOKENS = 1250
+EVAL_ITEM_OUTPUT_TOKENS = 500
+# Leading characters of a cleaned page used for its near-duplicate signature
+SIGNATURE_CHARS = 20_000
+# Upper bound on the rounds requested from the query planner; later iterations get follow-up queries
+MAX_PLAN_ROUNDS = 4
+# Runs of spaces and tabs within a line
+_SPACES_RE = re.compile(r"[ \t\f\v]+")
+# Lines consisting only of markdown links, as in Jina's rendering of menus and footers
+_LINK_LINE_RE = re.compile(r"^(?:[*+-]\s*)?(?:!?\[[^\]]*\]\([^)]*\)[\s|·•-]*)+$")
+# Outermost bracketed list in an LLM response
+_LIST_RE = re.compile(r"\[.*\]", re.DOTALL)
+# Code fence markers stripped from LLM responses; a language tag of any case is
+# only taken as one when it ends the fence line, so ```["a"]``` keeps its content
+_CODE_BLOCK_RE = re.compile(r"```(?:[\w+-]*[ \t]*\r?\n)?\s*")
+# Runs of characters replaced with a single "_" in generated report filenames
+_SANITIZE_RE = re.compile(r"[^a-z0-9]+")
+
+# Prompts and system messages, built once rather than per call
+_QUERY_GEN_SYSTEM = {"role": "system", "content": "You are a helpful and precise research assistant."}
+_PLANNER_SYSTEM = {"role": "system", "content": "You are a systematic research planner."}
+_EVALUATE_EXTRACT_SYSTEM = {"role": "system", "content": "You are a strict evaluator of research relevance and an expert in extracting relevant information."}
+_REPORT_SYSTEM = {"role": "system", "content": "You are a skilled report writer."}
+
+_QUERY_GEN_PROMPT = (
+    "You are an expert research assistant. Given the user's query, generate up to four distinct, "
+    "precise search queries that would help gather comprehensive information on the topic. "
+    'Respond ONLY with a JSON array of strings, for example: ["query1", "query2", "query3"].'
+)
+
+_PLAN_PROMPT = (
+    "You are an expert research planner. Given the user's query, plan up to "
+    "{max_rounds} rounds of web searches. Round 1 should contain up to four distinct, precise search "
+    "queries covering the main aspects of the topic; each later round should contain up to four queries "
+    "that go deeper into details, related subtopics, or verification of likely findings. "
+    "Use fewer rounds if the topic does not need them.\n"
+    'Respond ONLY with a JSON object of the form {{"round1": ["query1", "query2"], "round2": ["query3"]}} '
+    "and no other text."
+)
+
+_EVALUATE_EXTRACT_PROMPT = (
+    "You are a critical research evaluator and expert information extractor. Given the user's query, "
+    "the search query that led to this page, and the webpage content, first determine if the webpage "
+    "contains information relevant and useful for addressing the query. If it does, extract all pieces "
+    "of information that are relevant to answering the user's query, as plain text without commentary.\n"
+    'Respond ONLY with a JSON object of the form {"relevant": "Yes" or "No", "context": "<extracted text, '
+    'or an empty string if not relevant>"} and no other text.'
+)
+
+_EVALUATE_EXTRACT_BATCH_PROMPT = (
+    "You are a critical research evaluator and expert information extractor. For each numbered document above, "
+    "determine if the webpage contains information relevant and useful for addressing the user's query. "
+    "If it does, extract all pieces of information that are relevant to answering the user's query, "
+    "as plain text without commentary.\n"
+    "Respond ONLY with a JSON array of exactly {count} objects, one per document in order, of the form "
+    '{{"item": <document number>, "relevant": "Yes" or "No", "context": "<extracted text, or an empty string if not relevant>"}} '
+    "and no other text."
+)
+
+_NEW_QUERIES_PROMPT = (
+    "You are an analytical research assistant. Based on the original query, the search queries performed so far, "
+    "and the extracted contexts from webpages, determine if further research is needed. "
+    "If further research is needed, provide up to four new search queries as a JSON array (for example, "
+    '["new query1", "new query2"]). If you believe no further research is needed, respond with exactly <done>.'
+    "\nRespond ONLY with a JSON array or the token <done> without any additional text."
+)
+
+_REPORT_PROMPT = (
+    "You are an expert researcher and report writer. Based on the gathered contexts below and the original query, "
+    "write a comprehensive, well-structured, and detailed report that addresses the query thoroughly. "
+    "Include all relevant insights and conclusions without extraneous commentary."
+)
+
+# Elements that hold page chrome or code rather than readable content
+_HTML_NOISE_TAGS = ("script", "style", "noscript", "nav", "footer", "header", "aside", "form", "svg")
+# Elements whose text ends a line
+_HTML_BLOCK_TAGS = (
+    "p", "div", "li", "br", "tr", "td", "th", "pre", "blockquote",
+    "section", "article", "h1", "h2", "h3", "h4", "h5", "h6"
+)
+
+def html_to_text(page: str) -> str:
+    """Readable text of an HTML page, one block per line, with headings marked as ``#`` lines.
+    
+    Scripts, styles and navigation/footer chrome are dropped. CPU-bound; call it off the event loop.
+    """
+    try:
+        root = lxml_html.fromstring(page)
+    except (etree.ParserError, ValueError):
+        return page
+    etree.strip_elements(root, *_HTML_NOISE_TAGS, with_tail=False)
+    for element in root.iter(*_HTML_BLOCK_TAGS):
+        if element.tag[0] == "h" and element.tag[1:].isdigit():
+            element.text = f"# {element.text or ''}"
+        element.tail = f"\n{element.tail or ''}"
+    return root.text_content()
+
+@functools.lru_cache(maxsize=256)
+def _clean_page(text: str) -> str:
+    """Collapse whitespace and drop link-only and short navigation-like lines (headings are kept).
+    
+    Cached, since a page is cleaned for its signature and again for each prompt it appears in.
+    """
+    lines = []
+    for line in text.splitlines():
+        line = _SPACES_RE.sub(" ", line).strip()
+        if not line or _LINK_LINE_RE.match(line):
+            continue
+        if len(line) < NAV_LINE_CHARS and not line.startswith("#") and not line.endswith((".", "?", "!", ":")):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+def prepare_page(text: str, max_tokens: int = PAGE_TOKEN_BUDGET) -> str:
+    """Trim a fetched page to its content for a prompt, within roughly max_tokens tokens.
+    
+    Cleans the page with _clean_page, then truncates at a word boundary using
+    CHARS_PER_TOKEN as the token estimate.
+    """
+    page = _clean_page(text)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(page) <= max_chars:
+        return page
+    cut = page.rfind(" ", 0, max_chars)
+    return page[:cut if cut > max_chars // 2 else max_chars]
+
+# Query parameters that only track where a click came from
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid")
+
+@functools.lru_cache(maxsize=1024)
+def canonical_url(url: str) -> str:
+    """Normalize a URL so trivially different links to one page compare equal.
+    
+    Lowercases scheme and host, drops the fragment and tracking parameters,
+    and strips a trailing slash from the path.
+    """
+    parts = urlsplit(url.strip())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip("/") or "/",
+        urlencode(query),
+        ""
+    ))
+
+@functools.lru_cache(maxsize=256)
+def _clean_response(response: str) -> str:
+    # Cached: cache hits and repeated prompts return identical responses
+    return _CODE_BLOCK_RE.sub("", response).strip()
 
 class ResearchEngine:
     def __init__(
         self,
         jina_api_key: str,
-        config
+        config,
+        session: Optional[aiohttp.ClientSession] = None
     ):
         self.jina_api_key = jina_api_key
+        # HTTP session reused across research() calls; created lazily if the caller passes none
+        self._session = session
+        self._owns_session = session is None
+        self._session_lock = asyncio.Lock()
+        # Bounds per-link fetch/extract work so LLM/Jina rate limits are respected
+        self._link_sem = asyncio.Semaphore(config.max_concurrency)
+        # Per-upstream limits, so a rate-limit storm on one service stays local to it
+        # (the search provider carries its own limiter)
+        self._jina_limiter = AsyncRateLimiter(config.jina_max_concurrency, config.jina_requests_per_second)
         
-        # Initialize providers
+        # Initialize providers; the fast one is the same provider unless a fast model is configured
         self.llm_provider = get_llm_provider(config)
+        self.fast_llm_provider = get_llm_provider(config, fast=True)
         self.search_provider = get_search_provider(config)
         
         # API endpoints
         self.jina_base_url = "https://r.jina.ai/"
         
-        logger.info(f"ResearchEngine initialized with LLM provider: {config.llm_provider}")
-        logger.info(f"Using search provider: {config.search_provider}")
+        # Directories already created for saved reports, so each is made only once
+        self._output_dirs = set()
+        
+        # LLM response cache; only low-temperature calls are admitted
+        self.cache = LLMCache(
+            make_backend(config.llm_cache_path, config.llm_cache_redis_url),
+            config.llm_cache_size,
+            config.llm_cache_ttl,
+            config.llm_cache_similarity_threshold
+        )
+        self.cache_max_temperature = config.llm_cache_max_temperature
+        # Characters of context gathered before research stops iterating
+        self.context_budget = config.context_budget_chars
+        # Fetched page text on disk, so revisited sources skip Jina
+        self.page_cache = PageCache(config.page_cache_dir, config.page_cache_ttl) if config.page_cache_dir else None
+        # Requests currently in flight, so identical concurrent requests share one result
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Usefulness verdicts per user query, as (page shingles, verdict) pairs
+        self._useful_cache: "OrderedDict[str, List[Tuple[FrozenSet[int], str]]]" = OrderedDict()
+        # Search result links per normalized query
+        self._serp_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        # url -> (page text, expiry), so URLs resurfacing across iterations skip the disk cache too
+        self._fetch_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.fetch_cache_ttl = config.page_cache_ttl
+        
+        logger.info("ResearchEngine initialized with LLM provider: %s", config.llm_provider)
+        logger.info("Using search provider: %s", config.search_provider)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the long-lived HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    self._session = create_session(
+                        keepalive_timeout=60,
+                        timeout=aiohttp.ClientTimeout(total=60)
+                    )
+                    self._owns_session = True
+        return self._session
+
+    async def aclose(self) -> None:
+        """Close the HTTP session if the engine created it; a caller-supplied session is left open."""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        await self.cache.aclose()
+
+    def set_provider(self, provider: LLMProvider, fast_provider: Optional[LLMProvider] = None) -> None:
+        """Swap the LLM providers in place without rebuilding the engine.
+        
+        ``fast_provider`` serves the high-volume roles and defaults to ``provider``.
+        """
+        self.llm_provider = provider
+        self.fast_llm_provider = fast_provider or provider
+        logger.info("ResearchEngine switched LLM provider to: %s", type(provider).__name__)
         
-    async def call_llm(self, session: aiohttp.ClientSession, messages: List[Dict[str, str]]) -> Optional[str]:
-        """Call the LLM provider with the given messages."""
+    async def call_llm(
+        self,
+        session: aiohttp.ClientSession,
+        messages: List[Dict[str, str]],
+        on_delta: Optional[DeltaCallback] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        role: Optional[LLMRole] = None,
+        similar_scope: Optional[str] = None
+    ) -> Optional[str]:
+        """Call the LLM provider with the given messages, streaming deltas to on_delta if given.
+        
+        Query and classifier roles use the fast provider; the report
+        role, or no role, uses the main one. Calls at or below cache_max_temperature
+        are served from the response cache when possible. With ``similar_scope`` (the
+        queries the prompt embeds) near-duplicate long prompts in the same scope are
+        also served, via the cache's similarity tier.
+        """
+        provider = self.fast_llm_provider if role in _FAST_ROLES else self.llm_provider
+        cache_key = None
+        signature = None
+        if temperature <= self.cache_max_temperature:
+            model = f"{type(provider).__name__}:{getattr(provider, 'model', '')}"
+            cache_key = LLMCache.make_key(model, messages, temperature)
+            if similar_scope is not None:
+                signature = self.cache.signature(model, messages, temperature, similar_scope)
+            cached = await self.cache.get(cache_key)
+            if cached is None and signature is not None:
+                cached = await self.cache.get_similar(signature)
+            if cached is not None:
+                logger.debug("LLM cache hit (stats: %s)", self.cache.stats)
+                if on_delta is not None:
+                    await on_delta(cached)
+                return cached
+        
+        if cache_key is not None and on_delta is None:
+            return await self._coalesce(
+                f"llm:{cache_key}",
+                lambda: self._call_provider(session, provider, messages, temperature, None, cache_key, signature, max_tokens)
+            )
+        return await self._call_provider(session, provider, messages, temperature, on_delta, cache_key, signature, max_tokens)
+
+    async def _call_provider(
+        self,
+        session: aiohttp.ClientSession,
+        provider: LLMProvider,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        on_delta: Optional[DeltaCallback],
+        cache_key: Optional[str],
+        signature: Optional[Signature] = None,
+        max_tokens: int = 1000
+    ) -> Optional[str]:
+        # Prompts and responses run to many KB; skip even building the log calls unless debugging
+        debug = logger.isEnabledFor(logging.DEBUG)
         try:
-            logger.debug(f"Calling LLM provider with messages: {messages}")
-            response = await self.llm_provider.generate_completion(session, messages)
+            if debug:
+                logger.debug("Calling LLM provider with messages: %r", messages)
+            response = await provider.generate_completion(
+                session,
+                messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=on_delta is not None,
+                on_delta=on_delta
+            )
             if response:
-                logger.debug(f"LLM response: {response}")
+                if debug:
+                    logger.debug("LLM response: %s", response)
+                if cache_key is not None:
+                    await self.cache.set(cache_key, response)
+                    if signature is not None:
+                        self.cache.add_similar(signature, cache_key)
                 return response
             else:
                 logger.error("LLM provider returned None")
                 return None
         except Exception as e:
-            logger.error(f"Error calling LLM provider: {str(e)}", exc_info=True)
+            logger.error("Error calling LLM provider: %s", e, exc_info=True)
             return None
 
     def _clean_llm_response(self, response: str) -> str:
         """Clean the LLM response by removing code blocks and other formatting."""
-        if response is None:
-            return ""
-        # Remove code block markers
-        response = response.replace("```python", "").replace("```", "")
-        # Remove leading/trailing whitespace
-        response = response.strip()
-        return response
+        return _clean_response(response) if response else ""
+
+    @staticmethod
+    def _parse_list(text: str) -> Optional[list]:
+        """Parse a list from LLM output, or None if it holds no parseable list.
+        
+        The whole text is tried first, as JSON and then as a Python literal; only if
+        that fails is the outermost bracketed span searched for in surrounding prose.
+        """
+        candidates = [text]
+        match = _LIST_RE.search(text)
+        if match and match.group(0) != text:
+            candidates.append(match.group(0))
+        for candidate in candidates:
+            try:
+                value = orjson.loads(candidate)
+            except orjson.JSONDecodeError:
+                try:
+                    value = ast.literal_eval(candidate)
+                except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+                    continue
+            if isinstance(value, list):
+                return value
+        return None
 
     async def generate_search_queries(self, session: aiohttp.ClientSession, user_query: str) -> List[str]:
-        prompt = (
-            "You are an expert research assistant. Given the user's query, generate up to four distinct, "
-            "precise search queries that would help gather comprehensive information on the topic. "
-            "Return only a Python list of strings, for example: ['query1', 'query2', 'query3']."
-        )
+        prompt = _QUERY_GEN_PROMPT
         messages = [
-            {"role": "system", "content": "You are a helpful and precise research assistant."},
+            _QUERY_GEN_SYSTEM,
             {"role": "user", "content": f"User Query: {user_query}\n\n{prompt}"}
         ]
         
-        logger.info(f"Generating search queries for: {user_query}")
-        response = await self.call_llm(session, messages)
+        logger.info("Generating search queries for: %s", user_query)
+        response = await self.call_llm(session, messages, role="query")
         if response:
-            try:
-                cleaned_response = self._clean_llm_response(response)
-                start = cleaned_response.find('[')
-                end = cleaned_response.rfind(']') + 1
-                if start != -1 and end != 0:
-                    list_str = cleaned_response[start:end]
-                    logger.debug(f"Extracted list string: {list_str}")
-                    queries = eval(list_str)
-                    if isinstance(queries, list):
-                        if len(queries) > 0 and all(isinstance(q, str) for q in queries):
-                            logger.info(f"Generated queries: {queries}")
-                            return queries[:4]
-                        else:
-                            logger.warning("Generated empty list or invalid query types")
-                    else:
-                        logger.warning(f"Response was not a list: {type(queries)}")
-                else:
-                    logger.warning("Could not find list brackets in response")
-            except Exception as e:
-                logger.error(f"Error parsing search queries: {str(e)}", exc_info=True)
+            queries = self._parse_list(self._clean_llm_response(response))
+            if queries is None:
+                logger.warning("Could not parse a list of queries from response")
+            elif len(queries) > 0 and all(isinstance(q, str) for q in queries):
+                logger.info("Generated queries: %s", queries)
+                return queries[:4]
+            else:
+                logger.warning("Generated empty list or invalid query types")
         logger.warning("Failed to generate search queries")
         return []
 
-    async def perform_search(self, session: aiohttp.ClientSession, query: str) -> List[str]:
+    async def plan_queries(self, session: aiohttp.ClientSession, user_query: str, max_rounds: int) -> List[List[str]]:
+        """Plan up to MAX_PLAN_ROUNDS rounds of search queries in one LLM call.
+        
+        Returns the rounds in order, each with up to four queries, or an empty list if planning failed.
+        """
+        max_rounds = max(1, min(max_rounds, MAX_PLAN_ROUNDS))
+        prompt = _PLAN_PROMPT.format(max_rounds=max_rounds)
+        messages = [
+            _PLANNER_SYSTEM,
+            {"role": "user", "content": f"User Query: {user_query}\n\n{prompt}"}
+        ]
+        
+        logger.info("Planning search queries for: %s", user_query)
+        response = await self.call_llm(session, messages, role="query")
+        if not response:
+            logger.warning("Failed to plan search queries")
+            return []
+        
+        cleaned = self._clean_llm_response(response)
+        start = cleaned.find('{')
+        end = cleaned.rfind('}') + 1
+        try:
+            plan = orjson.loads(cleaned[start:end]) if start != -1 and end != 0 else None
+        except orjson.JSONDecodeError as e:
+            logger.error("Error parsing query plan: %s", e)
+            plan = None
+        if not isinstance(plan, dict):
+            logger.warning("Query plan was not a JSON object")
+            return []
+        
+        rounds = []
+        for i in range(1, max_rounds + 1):
+            queries = plan.get(f"round{i}")
+            if not isinstance(queries, list):
+                break
+            queries = [q for q in queries if isinstance(q, str) and q.strip()][:4]
+            if not queries:
+                break
+            rounds.append(queries)
+        logger.info("Planned query rounds: %s", rounds)
+        return rounds
+
+    @staticmethod
+    def _search_key(query: str) -> str:
+        """Normalize a query's case and whitespace only, so operators, quotes and word order survive."""
+        return " ".join(query.lower().split())
+
+    async def _search(self, session: aiohttp.ClientSession, query: str) -> List[str]:
         return await self.search_provider.search(session, query)
 
+    async def perform_search(self, session: aiohttp.ClientSession, query: str) -> List[str]:
+        """Search for query, reusing results for repeated queries."""
+        key = self._search_key(query)
+        cached = self._serp_cache.get(key)
+        if cached is not None:
+            self._serp_cache.move_to_end(key)
+            logger.info("Search results reused for query: %s", query)
+            return cached
+        
+        # Concurrent duplicates within one iteration share a single request
+        links = await self._coalesce(f"search:{key}", lambda: self._search(session, query))
+        if links:
+            self._serp_cache[key] = links
+            while len(self._serp_cache) > SERP_CACHE_SIZE:
+                self._serp_cache.popitem(last=False)
+        return links
+
+    async def _coalesce(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Run factory once per key at a time; concurrent callers for the same key share its result.
+        
+        The work runs in its own task and every caller, the first included, waits on it
+        through a shield, so a caller that times out or is cancelled gives up only its own
+        wait and never cancels the request the others share.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
     async def fetch_webpage_text(self, session: aiohttp.ClientSession, url: str) -> str:
+        # Caches and in-flight fetches are keyed by the canonical URL
+        key = canonical_url(url)
+        entry = self._fetch_cache.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._fetch_cache.move_to_end(key)
+                logger.info("Webpage content reused: %s", url)
+                return entry[0]
+            del self._fetch_cache[key]
+        
+        content = None
+        if self.page_cache is not None:
+            content = await self.page_cache.get(key)
+            if content is not None:
+                logger.info("Webpage content served from cache: %s", url)
+        if content is None:
+            content = await self._coalesce(f"fetch:{key}", lambda: self._fetch_webpage_text(session, url, key))
+        if content:
+            self._fetch_cache[key] = (content, time.monotonic() + self.fetch_cache_ttl)
+            self._fetch_cache.move_to_end(key)
+            while len(self._fetch_cache) > FETCH_CACHE_SIZE:
+                self._fetch_cache.popitem(last=False)
+        return content
+
+    async def _fetch_webpage_text(self, session: aiohttp.ClientSession, url: str, key: str) -> str:
         headers = {"Authorization": f"Bearer {self.jina_api_key}"}
         try:
-            logger.info(f"Fetching webpage content from: {url}")
-            async with session.get(f"{self.jina_base_url}{url}", headers=headers) as resp:
-                if resp.status == 200:
-                    content = await resp.text()
-                    logger.debug(f"Successfully fetched content from {url} (first 100 chars): {content[:100]}")
-                    return content
-                else:
-                    logger.error(f"Jina fetch error for {url}: {resp.status}")
-                    return ""
+            logger.info("Fetching webpage content from: %s", url)
+            status, content = await retrying_request(
+                lambda: session.get(f"{self.jina_base_url}{url}", headers=headers, timeout=JINA_TIMEOUT),
+                self._read_jina,
+                limiter=self._jina_limiter,
+                name=f"Jina fetch of {url}",
+                max_attempts=JINA_MAX_ATTEMPTS
+            )
+            if status != 200:
+                logger.error("Jina fetch error for %s: %s", url, status)
+                return ""
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Successfully fetched content from %s (first 100 chars): %s", url, content[:100])
+            if content and self.page_cache is not None:
+                await self.page_cache.set(key, content)
+            return content
         except Exception as e:
-            logger.error(f"Error fetching webpage text from {url}: {str(e)}", exc_info=True)
+            logger.error("Error fetching webpage text from %s: %s", url, e, exc_info=True)
+            return ""
+
+    @classmethod
+    async def _read_jina(cls, resp: aiohttp.ClientResponse) -> str:
+        """Read a Jina response as text; error bodies are not read."""
+        if resp.status != 200:
             return ""
+        content = await cls._read_page(resp)
+        if resp.content_type in ("text/html", "application/xhtml+xml"):
+            # Jina normally returns text, but passes some pages through as HTML
+            content = await asyncio.to_thread(html_to_text, content)
+        return content
+
+    @staticmethod
+    async def _read_page(resp: aiohttp.ClientResponse) -> str:
+        """Read only what the prompts can use instead of materializing the whole page."""
+        chunks = []
+        remaining = MAX_PAGE_BYTES
+        while remaining > 0:
+            chunk = await resp.content.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        if remaining <= 0:
+            # Drop the connection rather than let the rest of the body arrive
+            resp.close()
+        return b"".join(chunks).decode(resp.charset or "utf-8", errors="replace")
+
+    def _useful_verdicts(self, user_query: str) -> List[Tuple[FrozenSet[int], str]]:
+        """Cached usefulness verdicts for a user query, evicting the least recently used query."""
+        verdicts = self._useful_cache.setdefault(user_query, [])
+        self._useful_cache.move_to_end(user_query)
+        while len(self._useful_cache) > USEFUL_CACHE_QUERIES:
+            self._useful_cache.popitem(last=False)
+        return verdicts
+
+    @staticmethod
+    def _lexical_relevance(user_query: str, page_text: str) -> float:
+        """Fraction of the user query's topic words found in the page's content, ignoring navigation lines."""
+        return query_overlap(user_query, _clean_page(page_text))
 
     async def is_page_useful(self, session: aiohttp.ClientSession, user_query: str, page_text: str) -> str:
-        prompt = (
-            "You are a critical research evaluator. Given the user's query and the content of a webpage, "
-            "determine if the webpage contains information relevant and useful for addressing the query. "
-            "Respond with exactly one word: 'Yes' if the page is useful, or 'No' if it is not. Do not include any extra text."
-        )
-        messages = [
-            {"role": "system", "content": "You are a strict and concise evaluator of research relevance."},
-            {"role": "user", "content": f"User Query: {user_query}\n\nWebpage Content (first 20000 characters):\n{page_text[:20000]}\n\n{prompt}"}
-        ]
+        """Judge one page's usefulness as "Yes" or "No".
         
-        logger.info("Evaluating page usefulness")
-        response = await self.call_llm(session, messages)
-        if response:
-            answer = self._clean_llm_response(response).strip()
-            logger.info(f"Page usefulness evaluation result: {response}")
-            
-            if answer in ["Yes", "No"]:
-                return answer
-            elif "yes" in answer.lower():
-                return "Yes"
-            return "No"
-            
-        logger.warning("Failed to evaluate page usefulness, defaulting to No")
-        return "No"
+        Deprecated: use evaluate_and_extract, which also extracts the context in the same call.
+        """
+        warnings.warn(
+            "is_page_useful is deprecated; use evaluate_and_extract",
+            DeprecationWarning,
+            stacklevel=2
+        )
+        result = await self.evaluate_and_extract(session, user_query, user_query, page_text)
+        return result["relevant"]
 
     async def extract_relevant_context(
         self,
@@ -146,72 +617,239 @@ class ResearchEngine:
         search_query: str,
         page_text: str
     ) -> Optional[str]:
-        prompt = (
-            "You are an expert information extractor. Given the user's query, the search query that led to this page, "
-            "and the webpage content, extract all pieces of information that are relevant to answering the user's query. "
-            "Return only the relevant context as plain text without commentary."
+        """Extract the context relevant to the user query from one page.
+        
+        Deprecated: use evaluate_and_extract, which also judges relevance in the same call.
+        """
+        warnings.warn(
+            "extract_relevant_context is deprecated; use evaluate_and_extract",
+            DeprecationWarning,
+            stacklevel=2
         )
+        result = await self.evaluate_and_extract(session, user_query, search_query, page_text)
+        return result["context"] or None
+
+    async def evaluate_and_extract(
+        self,
+        session: aiohttp.ClientSession,
+        user_query: str,
+        search_query: str,
+        page_text: str
+    ) -> Dict[str, str]:
+        """Judge a page's relevance and extract its context in a single LLM call.
+        
+        Returns ``{"relevant": "Yes" | "No", "context": str}``; context is empty unless relevant.
+        Replaces the is_page_useful + extract_relevant_context pair.
+        """
+        not_relevant = {"relevant": "No", "context": ""}
+        
+        # Near-duplicates of a page already judged useless are skipped without an LLM call
+        signature = shingles(_clean_page(page_text)[:SIGNATURE_CHARS])
+        verdicts = self._useful_verdicts(user_query)
+        for cached_signature, cached_verdict in verdicts:
+            if cached_verdict == "No" and jaccard(signature, cached_signature) >= NEAR_DUPLICATE_THRESHOLD:
+                logger.info("Page usefulness reused from near-duplicate page: No")
+                return not_relevant
+        
+        prompt = _EVALUATE_EXTRACT_PROMPT
         messages = [
-            {"role": "system", "content": "You are an expert in extracting and summarizing relevant information."},
+            _EVALUATE_EXTRACT_SYSTEM,
             {
                 "role": "user",
                 "content": f"User Query: {user_query}\nSearch Query: {search_query}\n\n"
-                          f"Webpage Content (first 20000 characters):\n{page_text[:20000]}\n\n{prompt}"
+                          f"Webpage Content (excerpt):\n{prepare_page(page_text)}\n\n{prompt}"
             }
         ]
         
-        logger.info("Extracting relevant context from webpage")
-        response = await self.call_llm(session, messages)
-        if response:
-            context = response.strip()
-            if context:
-                logger.debug(f"Extracted context (first 100 chars): {context[:100]}")
-                return context
-            
-        logger.warning("Failed to extract context")
+        logger.info("Evaluating page usefulness and extracting context")
+        response = await self.call_llm(session, messages, role="classifier", similar_scope=f"{user_query}\n{search_query}")
+        if not response:
+            logger.warning("Failed to evaluate page, defaulting to not relevant")
+            return not_relevant
+        
+        cleaned = self._clean_llm_response(response)
+        parsed = self._parse_evaluation(cleaned)
+        if parsed is None:
+            logger.warning("Could not parse evaluation response, defaulting to not relevant")
+            return not_relevant
+        
+        relevant, context = parsed
+        verdicts.append((signature, relevant))
+        logger.info("Page usefulness evaluation result: %s", relevant)
+        return {"relevant": relevant, "context": context if relevant == "Yes" else ""}
+
+    @staticmethod
+    def _evaluation_from_dict(result: dict) -> Tuple[str, str]:
+        """(verdict, context) from one evaluation object."""
+        flag = result.get("relevant", result.get("useful"))
+        relevant = "Yes" if flag is True or str(flag).strip().lower() in ("yes", "true") else "No"
+        context = result.get("context") or result.get("bullets") or ""
+        if isinstance(context, list):
+            context = "\n".join(f"- {item}" for item in context)
+        return relevant, str(context).strip() if relevant == "Yes" else ""
+
+    @staticmethod
+    def _parse_evaluation(cleaned: str) -> Optional[Tuple[str, str]]:
+        """Parse a fused evaluation into (verdict, context); None if it can't be interpreted.
+        
+        Accepts the requested JSON object (``relevant`` or ``useful`` as the verdict, context
+        as text or a list of bullets) and falls back to plain text: a leading Yes/No followed
+        by bullet points.
+        """
+        start = cleaned.find('{')
+        end = cleaned.rfind('}') + 1
+        try:
+            result = orjson.loads(cleaned[start:end]) if start != -1 and end != 0 else None
+        except orjson.JSONDecodeError as e:
+            logger.debug("Evaluation response is not JSON: %s", e)
+            result = None
+        
+        if isinstance(result, dict):
+            return ResearchEngine._evaluation_from_dict(result)
+        
+        # Plain-text fallback: a verdict on the first line, bullet points as the context
+        lines = cleaned.splitlines()
+        if not lines:
+            return None
+        if lines[0].strip().lower().startswith("no"):
+            return "No", ""
+        bullets = [line.strip() for line in lines if line.lstrip().startswith(("-", "*", "•"))]
+        if bullets:
+            return "Yes", "\n".join(bullets)
         return None
 
+    async def evaluate_and_extract_batch(
+        self,
+        session: aiohttp.ClientSession,
+        user_query: str,
+        items: List[Tuple[str, str]]
+    ) -> List[Dict[str, str]]:
+        """Judge and extract many pages, one LLM call per EVAL_BATCH_SIZE pages.
+        
+        ``items`` are (search query, page text) pairs. Returns one
+        ``{"relevant": ..., "context": ...}`` result per item, in order, like evaluate_and_extract.
+        """
+        not_relevant = {"relevant": "No", "context": ""}
+        results: List[Dict[str, str]] = [not_relevant] * len(items)
+        
+        # Near-duplicates of pages already judged useless are skipped without an LLM call
+        verdicts = self._useful_verdicts(user_query)
+        signatures = [shingles(_clean_page(text)[:SIGNATURE_CHARS]) for _, text in items]
+        pending = [
+            i for i, signature in enumerate(signatures)
+            if not any(
+                cached_verdict == "No" and jaccard(signature, cached_signature) >= NEAR_DUPLICATE_THRESHOLD
+                for cached_signature, cached_verdict in verdicts
+            )
+        ]
+        if len(pending) < len(items):
+            logger.info("Page usefulness reused for %s near-duplicate pages", len(items) - len(pending))
+        
+        batches = [pending[i:i + EVAL_BATCH_SIZE] for i in range(0, len(pending), EVAL_BATCH_SIZE)]
+        answers = await asyncio.gather(
+            *(self._evaluate_batch(session, user_query, [items[i] for i in batch]) for batch in batches)
+        )
+        for batch, batch_answers in zip(batches, answers):
+            if batch_answers is None:
+                # Batch response unusable: evaluate its pages one by one instead
+                logger.warning("Batched evaluation failed, evaluating %s pages individually", len(batch))
+                for i, result in zip(batch, await asyncio.gather(
+                    *(self.evaluate_and_extract(session, user_query, *items[i]) for i in batch)
+                )):
+                    results[i] = result
+                continue
+            for i, (relevant, context) in zip(batch, batch_answers):
+                verdicts.append((signatures[i], relevant))
+                results[i] = {"relevant": relevant, "context": context}
+        return results
+
+    async def _evaluate_batch(
+        self,
+        session: aiohttp.ClientSession,
+        user_query: str,
+        items: List[Tuple[str, str]]
+    ) -> Optional[List[Tuple[str, str]]]:
+        """One batched evaluation call; None if the response can't be matched to the items."""
+        blocks = "\n\n".join(
+            f"### DOC {n}\nSearch Query: {search_query}\n{prepare_page(text, EVAL_ITEM_INPUT_TOKENS)}"
+            for n, (search_query, text) in enumerate(items, 1)
+        )
+        prompt = _EVALUATE_EXTRACT_BATCH_PROMPT.format(count=len(items))
+        messages = [
+            _EVALUATE_EXTRACT_SYSTEM,
+            {
+                "role": "user",
+                "content": f"User Query: {user_query}\n\n"
+                          f"Webpages (excerpts):\n{blocks}\n\n{prompt}"
+            }
+        ]
+        
+        logger.info("Evaluating and extracting %s pages", len(items))
+        # No similarity tier here: answers map to pages by position, so a near-identical batch
+        # with one page swapped or reordered must not be served another batch's answers
+        response = await self.call_llm(
+            session,
+            messages,
+            max_tokens=EVAL_ITEM_OUTPUT_TOKENS * len(items),
+            role="classifier"
+        )
+        if not response:
+            return None
+        
+        answers = self._parse_list(self._clean_llm_response(response))
+        if answers is None or not all(isinstance(answer, dict) for answer in answers):
+            logger.warning("Batched evaluation result was not a JSON array of objects")
+            return None
+        
+        # Align by item number when every object carries a valid one, else by position
+        if len(answers) != len(items):
+            logger.warning("Batched evaluation returned %s results for %s items", len(answers), len(items))
+            return None
+        numbers = [answer.get("item") for answer in answers]
+        if all(isinstance(n, int) for n in numbers) and sorted(numbers) == list(range(1, len(items) + 1)):
+            answers = sorted(answers, key=lambda answer: answer["item"])
+        return [self._evaluation_from_dict(answer) for answer in answers]
+
     async def get_new_search_queries(
         self,
         session: aiohttp.ClientSession,
         user_query: str,
         previous_queries: List[str],
-        contexts: List[str]
+        contexts: List[str],
+        context_joined: Optional[str] = None
     ) -> Optional[List[str]]:
-        context_combined = "\n".join(contexts)
-        prompt = (
-            "You are an analytical research assistant. Based on the original query, the search queries performed so far, "
-            "and the extracted contexts from webpages, determine if further research is needed. "
-            "If further research is needed, provide up to four new search queries as a Python list (for example, "
-            "['new query1', 'new query2']). If you believe no further research is needed, respond with exactly ."
-            "\nOutput only a Python list or the token  without any additional text."
-        )
+        """Decide whether more research is needed; None means done.
+        
+        Pass ``context_joined`` (the deduplicated contexts already joined) to skip rebuilding it.
+        """
+        context_combined = context_joined if context_joined is not None else "\n".join(dedupe(contexts, CONTEXT_DUPLICATE_THRESHOLD))
+        prompt = _NEW_QUERIES_PROMPT
         messages = [
-            {"role": "system", "content": "You are a systematic research planner."},
+            _PLANNER_SYSTEM,
             {
                 "role": "user",
-                "content": f"User Query: {user_query}\nPrevious Search Queries: {previous_queries}\n\n"
-                          f"Extracted Relevant Contexts:\n{context_combined}\n\n{prompt}"
+                # Contexts only grow between iterations, so they precede the query list to keep
+                # the prompt prefix identical for provider-side prompt caching
+                "content": f"User Query: {user_query}\n\nExtracted Relevant Contexts:\n{context_combined}\n\n"
+                          f"Previous Search Queries: {previous_queries}\n\n{prompt}"
             }
         ]
         
         logger.info("Checking if more research queries are needed")
-        response = await self.call_llm(session, messages)
+        response = await self.call_llm(session, messages, role="query")
         if response:
             cleaned = self._clean_llm_response(response)
-            logger.debug(f"Response for new queries: {cleaned}")
-            if cleaned == "":
+            logger.debug("Response for new queries: %s", cleaned)
+            if cleaned == "<done>":
                 logger.info("Research complete signal received")
                 return None
-            try:
-                queries = eval(cleaned)
-                if isinstance(queries, list) and len(queries) > 0:
-                    logger.info(f"Generated new queries: {queries}")
-                    return queries
-                else:
-                    logger.warning("Invalid queries format or empty list")
-            except Exception as e:
-                logger.error(f"Error parsing new search queries: {str(e)}", exc_info=True)
+            queries = self._parse_list(cleaned)
+            if queries is not None:
+                queries = [q for q in queries if isinstance(q, str) and q.strip()]
+            if queries:
+                logger.info("Generated new queries: %s", queries)
+                return queries
+            logger.warning("Invalid queries format or empty list")
         logger.warning("Failed to generate new search queries")
         return []
 
@@ -219,26 +857,24 @@ class ResearchEngine:
         self,
         session: aiohttp.ClientSession,
         user_query: str,
-        contexts: List[str]
+        contexts: List[str],
+        on_delta: Optional[DeltaCallback] = None,
+        context_joined: Optional[str] = None
     ) -> str:
         if not contexts or not any(ctx.strip() for ctx in contexts):
             return "I couldn't find enough relevant information to answer your question. Please try rephrasing or being more specific."
 
-        context_combined = "\n".join(contexts)
-        prompt = (
-            "You are an expert researcher and report writer. Based on the gathered contexts below and the original query, "
-            "write a comprehensive, well-structured, and detailed report that addresses the query thoroughly. "
-            "Include all relevant insights and conclusions without extraneous commentary."
-        )
+        context_combined = context_joined if context_joined is not None else "\n".join(dedupe(contexts, CONTEXT_DUPLICATE_THRESHOLD))
+        prompt = _REPORT_PROMPT
         messages = [
-            {"role": "system", "content": "You are a skilled report writer."},
+            _REPORT_SYSTEM,
             {
                 "role": "user",
                 "content": f"User Query: {user_query}\n\nGathered Relevant Contexts:\n{context_combined}\n\n{prompt}"
             }
         ]
         
-        response = await self.call_llm(session, messages)
+        response = await self.call_llm(session, messages, on_delta=on_delta, role="report")
         if not response:
             return "Error analyzing research data. Please try again."
             
@@ -247,12 +883,23 @@ class ResearchEngine:
         
         return response + methodology
 
+    def _write_file(self, filepath: str, content: str) -> None:
+        # Ensure the output directory exists
+        directory = os.path.dirname(filepath) or "."
+        if directory not in self._output_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._output_dirs.add(directory)
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(content)
+
     async def save_research_to_markdown(self, query: str, report: str, logs: List[str], filename: str = None) -> str:
         """Save the research results to a markdown file."""
+        # One stamp for both the filename and the content, so they agree
+        timestamp = time.time_ns() // 1_000_000_000
         if filename is None:
             # Create filename from query
-            safe_query = "".join(c if c.isalnum() else "_" for c in query[:30]).lower()
-            filename = f"research_{safe_query}_{int(asyncio.get_event_loop().time())}.md"
+            safe_query = _SANITIZE_RE.sub("_", query[:30].lower())
+            filename = f"research_{safe_query}_{timestamp}.md"
         
         # Create logs section
         logs_section = ""
@@ -272,34 +919,147 @@ class ResearchEngine:
 {logs_section}```
 
 ## Generated On
-{asyncio.get_event_loop().time()}
+{time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(timestamp))}
 
 *This report was automatically generated using OpenDeepResearcher-API.*
 """
         
         try:
-            # Ensure the research_outputs directory exists
-            os.makedirs("research_outputs", exist_ok=True)
             filepath = os.path.join("research_outputs", filename)
             
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(content)
+            # Create the directory and write in a worker thread so slow storage doesn't stall the event loop
+            await asyncio.to_thread(self._write_file, filepath, content)
             
-            logger.info(f"Research saved to: {filepath}")
+            logger.info("Research saved to: %s", filepath)
             return filepath
         except Exception as e:
-            logger.error(f"Error saving research to markdown: {str(e)}", exc_info=True)
+            logger.error("Error saving research to markdown: %s", e, exc_info=True)
             return ""
 
+    async def _fetch_link(
+        self,
+        session: aiohttp.ClientSession,
+        link: str,
+        semaphore: asyncio.Semaphore,
+        send_status: Callable[..., Awaitable[None]]
+    ) -> Optional[str]:
+        """Fetch one link under the semaphore, reporting progress.
+        
+        LINK_TIMEOUT bounds the fetch itself, counted from when the semaphore is acquired,
+        so links queued behind others are never timed out before they start. Statuses are
+        sent outside the semaphore, which every research run shares, so a slow status
+        consumer can't hold a link slot.
+        """
+        await send_status("processing", f"Processing: {link}", url=link)
+        try:
+            async with semaphore:
+                content = await asyncio.wait_for(self.fetch_webpage_text(session, link), LINK_TIMEOUT)
+        except asyncio.TimeoutError:
+            await send_status("warning", f"Timed out fetching {link}")
+            return None
+        if not content:
+            await send_status("warning", f"No content retrieved from {link}")
+        return content or None
+
+    async def _process_queries(
+        self,
+        session: aiohttp.ClientSession,
+        user_query: str,
+        queries: List[str],
+        send_status: Callable[..., Awaitable[None]],
+        seen_links: Optional[Set[str]] = None
+    ) -> List[str]:
+        """Search, fetch, evaluate and extract one iteration; returns the extracted contexts.
+        
+        ``seen_links`` holds the canonical URLs processed by earlier iterations of the same
+        research run; links already in it are skipped, and this iteration's are added.
+        Each search's new links start fetching as soon as that search returns, instead of
+        after the slowest one. Pages are then judged and extracted in batches with
+        evaluate_and_extract_batch. A failure on one link is reported and skipped.
+        """
+        semaphore = self._link_sem
+        # Each link keeps the first query that returned it; links to the same canonical URL are fetched once
+        unique_links: Dict[str, str] = {}
+        seen = seen_links if seen_links is not None else set()
+        fetches: List[asyncio.Task] = []
+        
+        async def search(query: str) -> Tuple[str, List[str]]:
+            # A failing search yields no links instead of aborting the iteration's other work
+            try:
+                return query, await self.perform_search(session, query)
+            except Exception as e:
+                logger.error("Search failed for query %s: %s", query, e, exc_info=True)
+                await send_status("warning", f"Search failed for query: {query}")
+                return query, []
+        
+        await send_status("progress", "Executing search queries in parallel")
+        try:
+            for search_done in asyncio.as_completed([search(q) for q in queries]):
+                query_used, found = await search_done
+                for link in found:
+                    key = canonical_url(link)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    unique_links[link] = query_used
+                    # Each fetch is bounded and isolated, so a straggler or failure never stalls the rest
+                    fetches.append(asyncio.create_task(self._fetch_link(session, link, semaphore, send_status)))
+        except BaseException:
+            for task in fetches:
+                task.cancel()
+            raise
+        
+        await send_status("links", f"Found {len(unique_links)} unique links", count=len(unique_links))
+        links = list(unique_links)
+        pages = await asyncio.gather(*fetches, return_exceptions=True)
+        
+        # Cheap rule-based prefilter so boilerplate and off-topic pages never reach the LLM
+        fetched = []
+        for link, page in zip(links, pages):
+            if isinstance(page, BaseException):
+                logger.error("Error fetching %s: %s", link, page)
+                await send_status("warning", f"Error processing {link}")
+            elif not page:
+                continue
+            elif len(page) < MIN_PAGE_CHARS:
+                await send_status("evaluation", f"Skipped {link}: page too short ({len(page)} characters)", url=link, useful=False)
+            elif self._lexical_relevance(user_query, page) < MIN_QUERY_OVERLAP:
+                await send_status("evaluation", f"Skipped {link}: too few query terms on page", url=link, useful=False)
+            else:
+                fetched.append((link, page))
+        
+        # LLM concurrency is bounded by the provider's rate limiter
+        results = await self.evaluate_and_extract_batch(
+            session, user_query, [(unique_links[link], page) for link, page in fetched]
+        )
+        
+        contexts = []
+        for (link, _), result in zip(fetched, results):
+            useful = result["relevant"] == "Yes"
+            await send_status("evaluation", f"Page usefulness: {result['relevant']}", url=link, useful=useful)
+            if useful and result["context"]:
+                contexts.append(result["context"])
+                preview = f"Extracted context (preview): {result['context'][:100]}..."
+                await send_status("context", preview, url=link)
+        return contexts
+
     async def research(
         self,
         user_query: str,
         max_iterations: int = 10,
-        status_queue: Optional[asyncio.Queue] = None
+        status_queue: Optional[asyncio.Queue] = None,
+        stream_report: bool = False
     ) -> Tuple[str, List[str]]:
         logs = []
         contexts = []
+        # Deduplicated view of contexts, maintained as they arrive rather than rebuilt per prompt
+        context_buffer = DedupeBuffer(CONTEXT_DUPLICATE_THRESHOLD)
+        # Digests of contexts kept so far, so exact repeats are dropped before they count toward the budget
+        context_hashes: Set[bytes] = set()
+        # Canonical URLs processed so far; a page resurfacing in a later iteration is not re-evaluated
+        seen_links: Set[str] = set()
         all_queries = []
+        total_chars = 0
         
         async def send_status(status_type: str, message: str, **kwargs):
             if status_queue:
@@ -311,90 +1071,99 @@ class ResearchEngine:
             logs.append(message)
             logger.info(message)
         
-        logger.info(f"Starting research for query: {user_query} (max iterations: {max_iterations})")
+        async def send_report_delta(delta: str):
+            await status_queue.put({"type": "report_delta", "delta": delta})
+        
+        logger.info("Starting research for query: %s (max iterations: %s)", user_query, max_iterations)
         await send_status("start", f"Starting research: {user_query}")
         
-        async with aiohttp.ClientSession() as session:
-            # Generate initial queries
-            await send_status("progress", "Generating initial search queries...")
+        session = await self._get_session()
+        
+        # Plan all query rounds up front; fall back to a single round of queries
+        await send_status("progress", "Generating initial search queries...")
+        plan = await self.plan_queries(session, user_query, max_iterations)
+        if not plan:
             queries = await self.generate_search_queries(session, user_query)
-            if not queries:
-                message = "LLM provider rate limit exceeded. Please try again later or upgrade to a paid plan."
-                await send_status("error", message)
-                return f"Research failed: {message}", logs
-            
-            all_queries.extend(queries)
-            await send_status("queries", "Generated initial queries", queries=queries)
+            plan = [queries] if queries else []
+        if not plan:
+            message = "LLM provider rate limit exceeded. Please try again later or upgrade to a paid plan."
+            await send_status("error", message)
+            return f"Research failed: {message}", logs
+        
+        queries = plan[0]
+        all_queries.extend(queries)
+        await send_status("queries", "Generated initial queries", queries=queries)
+        
+        # Iterative research loop
+        for iteration in range(max_iterations):
+            iteration_message = f"\n=== Iteration {iteration + 1} ==="
+            await send_status("iteration", iteration_message, iteration=iteration + 1)
             
-            # Iterative research loop
-            for iteration in range(max_iterations):
-                iteration_message = f"\n=== Iteration {iteration + 1} ==="
-                await send_status("iteration", iteration_message, iteration=iteration + 1)
-                
-                # Perform searches
-                await send_status("progress", "Executing search queries in parallel")
-                search_tasks = [self.perform_search(session, q) for q in queries]
-                search_results = await asyncio.gather(*search_tasks)
-                
-                # Process unique links
-                unique_links = {}
-                for idx, links in enumerate(search_results):
-                    query_used = queries[idx]
-                    for link in links:
-                        if link not in unique_links:
-                            unique_links[link] = query_used
-                
-                await send_status("links", f"Found {len(unique_links)} unique links", count=len(unique_links))
-                
-                # Process each link
-                iteration_contexts = []
-                for link, search_query in unique_links.items():
-                    await send_status("processing", f"Processing: {link}", url=link)
-                    
-                    # Fetch and evaluate content
-                    content = await self.fetch_webpage_text(session, link)
-                    if not content:
-                        await send_status("warning", f"No content retrieved from {link}")
-                        continue
-                    
-                    usefulness = await self.is_page_useful(session, user_query, content)
-                    await send_status("evaluation", f"Page usefulness: {usefulness}", url=link, useful=usefulness=="Yes")
-                    
-                    if usefulness == "Yes":
-                        if context := await self.extract_relevant_context(session, user_query, search_query, content):
-                            iteration_contexts.append(context)
-                            preview = f"Extracted context (preview): {context[:100]}..."
-                            await send_status("context", preview, url=link)
-                
-                if iteration_contexts:
-                    contexts.extend(iteration_contexts)
-                    await send_status("progress", f"Added {len(iteration_contexts)} new contexts", count=len(iteration_contexts))
-                else:
-                    await send_status("warning", "No useful contexts found in this iteration")
-                
-                # Check if more research is needed
-                queries = await self.get_new_search_queries(session, user_query, all_queries, contexts)
-                if not queries:
-                    await send_status("progress", "No more queries needed. Generating report...")
-                    break
-                
-                all_queries.extend(queries)
-                await send_status("queries", "New queries for next iteration", queries=queries)
+            iteration_contexts = []
+            for context in await self._process_queries(session, user_query, queries, send_status, seen_links):
+                digest = hashlib.blake2b(context.encode(), digest_size=16).digest()
+                if digest not in context_hashes:
+                    context_hashes.add(digest)
+                    iteration_contexts.append(context)
             
-            # Generate final report
-            await send_status("progress", "Generating final research report")
-            report = await self.generate_final_report(session, user_query, contexts)
+            if iteration_contexts:
+                contexts.extend(iteration_contexts)
+                context_buffer.extend(iteration_contexts)
+                total_chars += sum(len(c) for c in iteration_contexts)
+                await send_status("progress", f"Added {len(iteration_contexts)} new contexts", count=len(iteration_contexts))
+            else:
+                await send_status("warning", "No useful contexts found in this iteration")
             
-            # Save research to markdown
-            await self.save_research_to_markdown(user_query, report, logs)
+            # Stop once the prompt would outgrow the budget, keeping the newest contexts
+            if total_chars > self.context_budget:
+                while len(contexts) > 1 and total_chars > self.context_budget:
+                    total_chars -= len(contexts.pop(0))
+                context_buffer = DedupeBuffer(CONTEXT_DUPLICATE_THRESHOLD)
+                context_buffer.extend(contexts)
+                await send_status("progress", "Context budget reached. Generating report...")
+                break
             
-            logger.info("Research completed successfully")
-            if status_queue:
-                await status_queue.put({
-                    "type": "complete",
-                    "message": "Research completed successfully",
-                    "report": report,
-                    "logs": logs
-                })
+            if iteration + 1 >= max_iterations:
+                break
+            # Follow the plan while its rounds turn up contexts; once it runs out, or a round
+            # finds nothing, ask for follow-up queries and stop when the LLM answers <done>
+            if iteration_contexts and iteration + 1 < len(plan):
+                queries = plan[iteration + 1]
+            else:
+                queries = await self.get_new_search_queries(
+                    session, user_query, all_queries, contexts, context_joined=context_buffer.joined()
+                )
+                plan[iteration + 1:] = [queries] if queries else []
+            if queries is None:
+                await send_status("progress", "No more queries needed. Generating report...")
+                break
+            if not queries:
+                await send_status("warning", "Could not generate follow-up queries. Generating report...")
+                break
             
-            return report, logs 
\ No newline at end of file
+            all_queries.extend(queries)
+            await send_status("queries", "New queries for next iteration", queries=queries)
+        
+        # Generate final report
+        await send_status("progress", "Generating final research report")
+        report = await self.generate_final_report(
+            session,
+            user_query,
+            contexts,
+            on_delta=send_report_delta if status_queue and stream_report else None,
+            context_joined=context_buffer.joined()
+        )
+        
+        # Save research to markdown
+        await self.save_research_to_markdown(user_query, report, logs)
+        
+        logger.info("Research completed successfully")
+        if status_queue:
+            await status_queue.put({
+                "type": "complete",
+                "message": "Research completed successfully",
+                "report": report,
+                "logs": logs
+            })
+        
+        return report, logs 
\ No newline at end of file
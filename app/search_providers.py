@@ -1,16 +1,57 @@
 from abc import ABC, abstractmethod
 import aiohttp
+import asyncio
 import logging
-from typing import List, Optional
-from bs4 import BeautifulSoup
+from typing import List, Optional, Tuple
+from lxml import etree, html as lxml_html
 import urllib.parse
-import json
+import orjson
+from .rate_limiter import AsyncRateLimiter, retrying_request
 
 logger = logging.getLogger(__name__)
 
+# DuckDuckGo result links; matches the class token like a CSS a.result__url selector
+_DDG_RESULT_HREFS = etree.XPath(
+    "//a[contains(concat(' ', normalize-space(@class), ' '), ' result__url ')]/@href"
+)
+
+def _parse_ddg_links(page: str, num_results: int) -> List[str]:
+    """Extract up to num_results absolute result URLs from a DuckDuckGo HTML results page."""
+    links = []
+    for href in _DDG_RESULT_HREFS(lxml_html.fromstring(page))[:num_results]:
+        href = str(href)
+        if href.startswith('/'):
+            continue
+        if not href.startswith(('http://', 'https://')):
+            href = 'https://' + href
+        links.append(href)
+    return links
+
 class SearchProvider(ABC):
     """Abstract base class for search providers."""
     
+    # Optional limiter attached by get_search_provider
+    limiter: Optional[AsyncRateLimiter] = None
+    max_attempts: int = 3
+    
+    async def _request(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> Tuple[int, bytes]:
+        """Send a request through the limiter, retrying throttles and transient failures.
+        
+        Returns the final status code and raw response body.
+        """
+        return await retrying_request(
+            lambda: session.request(method, url, **kwargs),
+            limiter=self.limiter,
+            name=type(self).__name__,
+            max_attempts=self.max_attempts
+        )
+    
     @abstractmethod
     async def search(
         self,
@@ -39,19 +80,19 @@ class SerpAPIProvider(SearchProvider):
         }
         
         try:
-            logger.info(f"Performing SERPAPI search for query: {query}")
-            async with session.get(self.url, params=params) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    organic_results = data.get("organic_results", [])
-                    links = [result["link"] for result in organic_results if "link" in result]
-                    logger.info(f"Found {len(links)} results from SERPAPI")
-                    return links
-                else:
-                    logger.error(f"SERPAPI error: {resp.status}")
-                    return []
+            logger.info("Performing SERPAPI search for query: %s", query)
+            status, raw = await self._request(session, "GET", self.url, params=params)
+            if status == 200:
+                data = orjson.loads(raw)
+                organic_results = data.get("organic_results", [])
+                links = [result["link"] for result in organic_results if "link" in result]
+                logger.info("Found %s results from SERPAPI", len(links))
+                return links
+            else:
+                logger.error("SERPAPI error: %s", status)
+                return []
         except Exception as e:
-            logger.error(f"Error performing SERPAPI search: {str(e)}", exc_info=True)
+            logger.error("Error performing SERPAPI search: %s", e, exc_info=True)
             return []
 
 class DDGProvider(SearchProvider):
@@ -77,29 +118,20 @@ class DDGProvider(SearchProvider):
         }
         
         try:
-            logger.info(f"Performing DuckDuckGo search for query: {query}")
-            async with session.post(self.url, data=params, headers=headers) as resp:
-                if resp.status == 200:
-                    html = await resp.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    results = soup.find_all('a', class_='result__url')
-                    links = []
-                    
-                    for result in results[:num_results]:
-                        href = result.get('href', '')
-                        if href.startswith('/'):
-                            continue
-                        if not href.startswith(('http://', 'https://')):
-                            href = 'https://' + href
-                        links.append(href)
-                    
-                    logger.info(f"Found {len(links)} results from DuckDuckGo")
-                    return links
-                else:
-                    logger.error(f"DuckDuckGo error: {resp.status}")
-                    return []
+            logger.info("Performing DuckDuckGo search for query: %s", query)
+            status, raw = await self._request(session, "POST", self.url, data=params, headers=headers)
+            if status == 200:
+                page = raw.decode("utf-8", errors="replace")
+                # Parse off the event loop so a large results page cannot stall it
+                links = await asyncio.to_thread(_parse_ddg_links, page, num_results)
+                
+                logger.info("Found %s results from DuckDuckGo", len(links))
+                return links
+            else:
+                logger.error("DuckDuckGo error: %s", status)
+                return []
         except Exception as e:
-            logger.error(f"Error performing DuckDuckGo search: {str(e)}", exc_info=True)
+            logger.error("Error performing DuckDuckGo search: %s", e, exc_info=True)
             return []
 
 class BingProvider(SearchProvider):
@@ -128,23 +160,22 @@ class BingProvider(SearchProvider):
         }
         
         try:
-            logger.info(f"Performing Bing search for query: {query}")
-            async with session.get(self.url, params=params, headers=headers) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    webpages = data.get("webPages", {}).get("value", [])
-                    links = [page["url"] for page in webpages if "url" in page]
-                    logger.info(f"Found {len(links)} results from Bing")
-                    return links
-                else:
-                    logger.error(f"Bing API error: {resp.status}")
-                    return []
+            logger.info("Performing Bing search for query: %s", query)
+            status, raw = await self._request(session, "GET", self.url, params=params, headers=headers)
+            if status == 200:
+                data = orjson.loads(raw)
+                webpages = data.get("webPages", {}).get("value", [])
+                links = [page["url"] for page in webpages if "url" in page]
+                logger.info("Found %s results from Bing", len(links))
+                return links
+            else:
+                logger.error("Bing API error: %s", status)
+                return []
         except Exception as e:
-            logger.error(f"Error performing Bing search: {str(e)}", exc_info=True)
+            logger.error("Error performing Bing search: %s", e, exc_info=True)
             return []
 
-def get_search_provider(config) -> SearchProvider:
-    """Factory function to create the appropriate search provider based on configuration."""
+def _create_search_provider(config) -> SearchProvider:
     provider = config.search_provider.lower()
     
     if provider == "serpapi" and config.serpapi_api_key:
@@ -157,5 +188,11 @@ def get_search_provider(config) -> SearchProvider:
         logger.warning("SerpAPI selected but no API key provided, falling back to DuckDuckGo")
         return DDGProvider()
     else:
-        logger.warning(f"Unsupported search provider: {provider}, using DuckDuckGo")
-        return DDGProvider() 
\ No newline at end of file
+        logger.warning("Unsupported search provider: %s, using DuckDuckGo", provider)
+        return DDGProvider()
+
+def get_search_provider(config) -> SearchProvider:
+    """Factory function to create the appropriate search provider based on configuration."""
+    provider = _create_search_provider(config)
+    provider.limiter = AsyncRateLimiter(config.search_max_concurrency, config.search_requests_per_second)
+    return provider
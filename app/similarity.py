@@ -0,0 +1,100 @@
+import re
+from typing import FrozenSet, Iterable, List, Optional, Set
+
+_WORD_RE = re.compile(r"\w+")
+# Runs of scripts written without spaces between words (Thai, CJK, kana, Hangul)
+_UNSPACED_RE = re.compile(r"[\u0e00-\u0e7f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+
+# Function words and question words that say nothing about a query's topic
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just me more most my no
+nor not now of off on once only or other our ours out over own same she should so some such than
+that the their theirs them then there these they this those through to too under until up very
+was we were what when where which while who whom whose why will with would you your yours
+explain tell describe give list show find compare difference versus vs
+""".split())
+
+def tokens(text: str, min_length: int = 3) -> Set[str]:
+    """Lowercased words of text, ignoring those shorter than min_length.
+    
+    Runs of unspaced scripts have no word boundaries to split on, so they contribute
+    their character bigrams (or the lone character) instead, whatever min_length is.
+    """
+    result = set()
+    for word in _WORD_RE.findall(text.lower()):
+        runs = _UNSPACED_RE.findall(word)
+        if runs:
+            for run in runs:
+                result.update(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+            word = _UNSPACED_RE.sub(" ", word)
+        result.update(part for part in word.split() if len(part) >= min_length)
+    return result
+
+def query_overlap(query: str, text: str) -> float:
+    """Fraction of the query's topic words (stopwords and question words removed) found in text.
+    
+    1.0 when the query has no topic words, so such queries never rule a text out.
+    """
+    query_tokens = tokens(query) - STOPWORDS
+    if not query_tokens:
+        return 1.0
+    return len(query_tokens & tokens(text)) / len(query_tokens)
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Hashed word n-grams of text, for cheap near-duplicate detection."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return frozenset({hash(tuple(words))}) if words else frozenset()
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """Jaccard similarity of two shingle sets (1.0 means identical)."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class DedupeBuffer:
+    """Texts with exact and near-duplicates dropped, deduplicated incrementally as they are added.
+    
+    A text is dropped if its first 256 characters match a kept text, or its shingle
+    Jaccard similarity with one is at least ``threshold``; the first of each group is kept.
+    """
+    
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.items: List[str] = []
+        self._prefixes: Set[str] = set()
+        self._signatures: List[FrozenSet[int]] = []
+        self._joined: Optional[str] = None
+    
+    def add(self, text: str) -> bool:
+        """Keep text unless it duplicates one already kept; returns whether it was kept."""
+        prefix = text[:256].strip().lower()
+        if prefix in self._prefixes:
+            return False
+        signature = shingles(text)
+        if any(jaccard(signature, other) >= self.threshold for other in self._signatures):
+            return False
+        self._prefixes.add(prefix)
+        self._signatures.append(signature)
+        self.items.append(text)
+        self._joined = None
+        return True
+    
+    def extend(self, texts: Iterable[str]) -> int:
+        """Add each text in order; returns how many were kept."""
+        return sum(self.add(text) for text in texts)
+    
+    def joined(self) -> str:
+        """Kept texts joined by newlines, rebuilt only after texts were added."""
+        if self._joined is None:
+            self._joined = "\n".join(self.items)
+        return self._joined
+
+def dedupe(texts: List[str], threshold: float) -> List[str]:
+    """Drop exact and near-duplicate texts, keeping the first of each group in order."""
+    buffer = DedupeBuffer(threshold)
+    buffer.extend(texts)
+    return buffer.items
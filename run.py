@@ -1,3 +1,4 @@
+import sys
 import uvicorn
 
 if __name__ == "__main__":
@@ -5,5 +6,8 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8080,
-        reload=True
-    ) 
\ No newline at end of file
+        reload=True,
+        # uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
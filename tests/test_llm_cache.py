@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from app.llm_cache import InMemoryLRU, LLMCache, SQLiteBackend
+
+MODEL = "FakeProvider:fake-model"
+
+LONG_PAGE = " ".join(f"Sentence {i} about coffee and its effects on health." for i in range(60))
+
+def _messages(content):
+    return [{"role": "system", "content": "You are a test."}, {"role": "user", "content": content}]
+
+def test_memory_get_set_and_expiry(monkeypatch):
+    async def run():
+        store = InMemoryLRU()
+        await store.set("key", "value", ttl=10)
+        assert await store.get("key") == "value"
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        assert await store.get("key") is None
+    asyncio.run(run())
+
+def test_memory_evicts_least_recently_used():
+    async def run():
+        store = InMemoryLRU(maxsize=2)
+        await store.set("a", "1", ttl=10)
+        await store.set("b", "2", ttl=10)
+        await store.get("a")
+        await store.set("c", "3", ttl=10)
+        assert await store.get("a") == "1"
+        assert await store.get("b") is None
+    asyncio.run(run())
+
+def test_sqlite_persists_and_deletes_expired(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    async def run():
+        backend = SQLiteBackend(path)
+        await backend.set("fresh", "kept", ttl=100)
+        await backend.set("stale", "dropped", ttl=10)
+        await backend.aclose()
+
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        backend = SQLiteBackend(path)
+        assert await backend.get("fresh") == "kept"
+        assert await backend.get("stale") is None
+        rows = backend._connect().execute("SELECT key FROM completions").fetchall()
+        assert rows == [("fresh",)]
+        await backend.aclose()
+    asyncio.run(run())
+
+def test_cache_reads_through_to_backend(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    async def run():
+        cache = LLMCache(SQLiteBackend(path))
+        key = LLMCache.make_key(MODEL, _messages("question"), 0.3)
+        await cache.set(key, "answer")
+        await cache.aclose()
+
+        cache = LLMCache(SQLiteBackend(path))
+        assert await cache.get(key) == "answer"
+        assert cache.stats["hits"] == 1
+        await cache.aclose()
+    asyncio.run(run())
+
+def test_make_key_depends_on_every_parameter():
+    key = LLMCache.make_key(MODEL, _messages("question"), 0.3)
+    assert key == LLMCache.make_key(MODEL, _messages("question"), 0.3)
+    assert key != LLMCache.make_key(MODEL, _messages("question"), 0.7)
+    assert key != LLMCache.make_key("OtherProvider:fake-model", _messages("question"), 0.3)
+    assert key != LLMCache.make_key(MODEL, _messages("other question"), 0.3)
+
+def test_similarity_tier_serves_near_duplicates_in_the_same_scope_only():
+    async def run():
+        cache = LLMCache()
+        messages = _messages(LONG_PAGE)
+        key = LLMCache.make_key(MODEL, messages, 0.3)
+        await cache.set(key, "answer")
+        cache.add_similar(cache.signature(MODEL, messages, 0.3, "coffee health"), key)
+
+        near_duplicate = _messages(LONG_PAGE + " One more sentence.")
+        same_scope = cache.signature(MODEL, near_duplicate, 0.3, "coffee health")
+        other_scope = cache.signature(MODEL, near_duplicate, 0.3, "coffee prices")
+        assert await cache.get_similar(same_scope) == "answer"
+        assert await cache.get_similar(other_scope) is None
+        assert cache.stats["similar_hits"] == 1
+    asyncio.run(run())
+
+def test_short_prompts_have_no_similarity_signature():
+    assert LLMCache().signature(MODEL, _messages("short prompt"), 0.3, "scope") is None
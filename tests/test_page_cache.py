@@ -0,0 +1,28 @@
+import asyncio
+import os
+import time
+
+from app.page_cache import PageCache
+
+URL = "https://example.com/article"
+
+def test_get_returns_what_was_set(tmp_path):
+    async def run():
+        cache = PageCache(str(tmp_path / "pages"))
+        assert await cache.get(URL) is None
+        await cache.set(URL, "page text")
+        assert await cache.get(URL) == "page text"
+        assert cache.stats == {"hits": 1, "misses": 1}
+    asyncio.run(run())
+
+def test_expired_pages_are_deleted_on_read(tmp_path):
+    directory = tmp_path / "pages"
+    async def run():
+        cache = PageCache(str(directory), ttl=10)
+        await cache.set(URL, "page text")
+        path = cache._path(URL)
+        stale = time.time() - 11
+        os.utime(path, (stale, stale))
+        assert await cache.get(URL) is None
+        assert not os.path.exists(path)
+    asyncio.run(run())
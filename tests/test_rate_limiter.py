@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from app.rate_limiter import AsyncRateLimiter, backoff_delay, retrying_request
+
+def _no_delay(attempt, retry_after=None):
+    return 0.0
+
+class FakeResponse:
+    def __init__(self, status, body=b"", headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def read(self):
+        return self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+def _sender(outcomes):
+    """send() callable that raises or returns the given outcomes in order."""
+    calls = []
+    def send():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    return send, calls
+
+def test_retries_throttles_and_transport_errors():
+    send, calls = _sender([
+        FakeResponse(503),
+        aiohttp.ServerDisconnectedError(),
+        asyncio.TimeoutError(),
+        FakeResponse(200, b"ok"),
+    ])
+    status, body = asyncio.run(retrying_request(send, max_attempts=4, delay=_no_delay))
+    assert (status, body) == (200, b"ok")
+    assert len(calls) == 4
+
+def test_non_retryable_status_is_returned_at_once():
+    send, calls = _sender([FakeResponse(404, b"missing"), FakeResponse(200)])
+    assert asyncio.run(retrying_request(send, delay=_no_delay)) == (404, b"missing")
+    assert len(calls) == 1
+
+def test_last_retryable_status_is_returned():
+    send, calls = _sender([FakeResponse(429), FakeResponse(429, b"slow down")])
+    assert asyncio.run(retrying_request(send, max_attempts=2, delay=_no_delay)) == (429, b"slow down")
+
+def test_last_transport_error_is_raised():
+    send, calls = _sender([aiohttp.ClientOSError(), aiohttp.ClientOSError()])
+    with pytest.raises(aiohttp.ClientOSError):
+        asyncio.run(retrying_request(send, max_attempts=2, delay=_no_delay))
+    assert len(calls) == 2
+
+def test_read_consumes_only_the_final_response():
+    read_statuses = []
+    async def read(resp):
+        read_statuses.append(resp.status)
+        return "parsed"
+    send, _ = _sender([FakeResponse(502), FakeResponse(200)])
+    assert asyncio.run(retrying_request(send, read, delay=_no_delay)) == (200, "parsed")
+    assert read_statuses == [200]
+
+def test_backoff_honors_numeric_retry_after():
+    assert backoff_delay(0, "7") == 7.0
+    assert backoff_delay(0, "120", max_delay=30.0) == 30.0
+    assert 1.0 <= backoff_delay(0, "Wed, 21 Oct 2026 07:28:00 GMT") <= 1.5
+
+def test_limiter_bounds_concurrency():
+    async def run():
+        limiter = AsyncRateLimiter(2)
+        active = peak = 0
+        async def request():
+            nonlocal active, peak
+            async with limiter:
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak
+    assert asyncio.run(run()) == 2
+
+def test_limiter_spaces_request_starts():
+    async def run():
+        limiter = AsyncRateLimiter(4, requests_per_second=50)
+        starts = []
+        async def request():
+            async with limiter:
+                starts.append(time.monotonic())
+        await asyncio.gather(*(request() for _ in range(3)))
+        return starts
+    starts = asyncio.run(run())
+    assert all(b - a >= 0.015 for a, b in zip(starts, starts[1:]))
@@ -0,0 +1,122 @@
+import asyncio
+import re
+
+import orjson
+
+from app.config import Settings
+from app.researcher import ResearchEngine, canonical_url, html_to_text, prepare_page
+
+USER_QUERY = "What are the health effects of coffee?"
+
+SHARED_BODY = " ".join(
+    f"Study {i} followed coffee drinkers over many years and measured their heart health." for i in range(40)
+)
+
+_DOC_RE = re.compile(r"### DOC (\d+)\nSearch Query: [^\n]*\n(Page \w+)")
+
+class FakeProvider:
+    """Answers batched evaluations with each document's marker line as its context."""
+    model = "fake-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_completion(self, session, messages, max_tokens=1000, temperature=0.3, stream=False, on_delta=None):
+        self.calls += 1
+        docs = _DOC_RE.findall(messages[-1]["content"])
+        return orjson.dumps([
+            {"item": int(n), "relevant": "Yes", "context": marker} for n, marker in docs
+        ]).decode()
+
+def _engine():
+    config = Settings(
+        _env_file=None,
+        jina_api_key="test",
+        openrouter_api_key="test",
+        page_cache_dir=None,
+        llm_cache_path=None
+    )
+    engine = ResearchEngine("test", config)
+    provider = FakeProvider()
+    engine.set_provider(provider)
+    return engine, provider
+
+def _page(name, body=SHARED_BODY):
+    return f"Page {name} reports these findings.\n{body}"
+
+def test_reordered_batch_keeps_each_context_with_its_page():
+    pages = [("coffee health", _page(name)) for name in "ABCD"]
+    async def run():
+        engine, provider = _engine()
+        first = await engine.evaluate_and_extract_batch(None, USER_QUERY, pages)
+        second = await engine.evaluate_and_extract_batch(None, USER_QUERY, pages[::-1])
+        return engine, provider, first, second
+    engine, provider, first, second = asyncio.run(run())
+    assert [r["context"] for r in first] == ["Page A", "Page B", "Page C", "Page D"]
+    assert [r["context"] for r in second] == ["Page D", "Page C", "Page B", "Page A"]
+    assert provider.calls == 2
+    assert engine.cache.stats["similar_hits"] == 0
+
+def test_swapped_page_in_batch_is_evaluated_afresh():
+    pages = [("coffee health", _page(name)) for name in "ABC"]
+    short_d = ("coffee health", "Page D reports that coffee is a popular drink.")
+    short_e = ("coffee health", "Page E reports that coffee beans are roasted.")
+    async def run():
+        engine, provider = _engine()
+        await engine.evaluate_and_extract_batch(None, USER_QUERY, [*pages, short_d])
+        results = await engine.evaluate_and_extract_batch(None, USER_QUERY, [*pages, short_e])
+        return provider, results
+    provider, results = asyncio.run(run())
+    assert results[-1]["context"] == "Page E"
+    assert provider.calls == 2
+
+def test_parse_list_accepts_json_literals_and_embedded_lists():
+    assert ResearchEngine._parse_list('["a", "b"]') == ["a", "b"]
+    assert ResearchEngine._parse_list("['a', 'b']") == ["a", "b"]
+    assert ResearchEngine._parse_list('Here are the queries: ["a", "b"] as requested.') == ["a", "b"]
+
+def test_parse_list_returns_none_on_malformed_input():
+    for text in ["", "<done>", "not a list", "[{[1]: 2}]", '{"a": 1}', "[unclosed"]:
+        assert ResearchEngine._parse_list(text) is None, text
+
+def test_parse_list_never_raises_on_unhashable_literals():
+    # literal_eval raises TypeError for a set holding a list; the inner list is still found
+    assert ResearchEngine._parse_list("{[1]}") == [1]
+
+def test_parse_evaluation_reads_json_and_plain_text():
+    assert ResearchEngine._parse_evaluation('{"relevant": "Yes", "context": "Coffee helps."}') == ("Yes", "Coffee helps.")
+    assert ResearchEngine._parse_evaluation('{"useful": true, "context": ["one", "two"]}') == ("Yes", "- one\n- two")
+    assert ResearchEngine._parse_evaluation('{"relevant": "No", "context": "ignored"}') == ("No", "")
+    assert ResearchEngine._parse_evaluation("No, this page is unrelated.") == ("No", "")
+    assert ResearchEngine._parse_evaluation("Yes\n- Coffee lowers risk.\n- Caffeine varies.") == (
+        "Yes", "- Coffee lowers risk.\n- Caffeine varies."
+    )
+
+def test_parse_evaluation_returns_none_on_malformed_input():
+    for text in ["", "Maybe?", '{"relevant": "Yes", "context": ', "[1, 2]"]:
+        assert ResearchEngine._parse_evaluation(text) is None, text
+
+def test_canonical_url_strips_tracking_parameters():
+    url = "HTTPS://Example.com/Article/?utm_source=news&id=7&fbclid=abc&gclid=x#comments"
+    assert canonical_url(url) == "https://example.com/Article?id=7"
+
+def test_canonical_url_keeps_meaningful_parameters_and_root():
+    assert canonical_url("https://example.com/search?q=coffee&page=2") == "https://example.com/search?q=coffee&page=2"
+    assert canonical_url("https://example.com") == "https://example.com/"
+
+def test_html_to_text_drops_markup_and_noise():
+    page = (
+        "<html><head><style>p { color: red; }</style></head><body>"
+        "<nav>Home | About</nav><h1>Coffee</h1><p>Coffee is <b>widely</b> consumed.</p>"
+        "<script>track();</script></body></html>"
+    )
+    text = html_to_text(page)
+    assert "Coffee is widely consumed." in text
+    assert "track()" not in text and "color" not in text and "About" not in text
+
+def test_prepare_page_drops_navigation_and_respects_budget():
+    page = "Home\n[Menu](https://example.com/menu)\n# Coffee\n" + "Coffee is widely consumed worldwide. " * 200
+    prepared = prepare_page(page, max_tokens=50)
+    assert prepared.startswith("# Coffee")
+    assert "Menu" not in prepared
+    assert len(prepared) <= 50 * 4
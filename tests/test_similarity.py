@@ -0,0 +1,27 @@
+from app.similarity import query_overlap
+
+QUERY = "What are the health effects of coffee?"
+
+OFF_TOPIC_PAGE = (
+    "Stock markets closed higher on Friday as investors weighed the latest inflation data. "
+    "What are analysts expecting next? The index rose 1.2 percent, and bond yields were flat."
+)
+
+ON_TOPIC_PAGE = (
+    "Moderate coffee consumption has been linked to several health benefits, although the "
+    "effects of caffeine vary between people."
+)
+
+def test_stopwords_do_not_count_as_query_terms():
+    assert query_overlap(QUERY, OFF_TOPIC_PAGE) == 0.0
+
+def test_topic_words_count():
+    assert query_overlap(QUERY, ON_TOPIC_PAGE) == 1.0
+
+def test_query_without_topic_words_never_rules_out():
+    assert query_overlap("what is it?", OFF_TOPIC_PAGE) == 1.0
+
+def test_unspaced_scripts_are_matched_by_character_bigrams():
+    query = "量子计算对密码学的影响"
+    assert query_overlap(query, "量子计算机可能会破解现有的公钥密码学算法。") >= 0.15
+    assert query_overlap(query, "今天股市收盘上涨，投资者关注通胀数据。") == 0.0